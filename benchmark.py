@@ -0,0 +1,338 @@
+"""
+Reproducible benchmark suite for the path planners.
+
+Generates seeded maps (open fields, random obstacles, mazes and
+rooms-and-corridors), runs the planners on them and records wall time,
+nodes expanded, peak memory and path length in a JSON file. Two result
+files can then be compared to flag regressions.
+
+Example:
+    python benchmark.py run --output before.json
+    (change the planner)
+    python benchmark.py run --output after.json
+    python benchmark.py compare before.json after.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import pathPlanner
+
+# Map sizes (cols, rows) run by default. 4096x4096 is only run with --full
+# or when passed in --sizes, since one pure Python search takes minutes.
+DEFAULT_SIZES = [(20, 10), (64, 64), (256, 256), (1024, 1024)]
+FULL_SIZES = DEFAULT_SIZES + [(4096, 4096)]
+
+# Map kinds; "randomNN" places obstacles on NN percent of the cells and
+# "costs" has patches of cells that cost 2 to 9 to cross
+MAP_KINDS = ["open", "random10", "random25", "random40", "maze", "rooms", "costs"]
+
+def open_map(cols, rows, rng):
+    cells = bytearray(b"\x01") * (cols * rows)
+    return cells, (0, 0), (cols - 1, rows - 1)
+
+
+def random_map(cols, rows, rng, density):
+    cells = bytearray(
+        0 if rng.random() < density else 1 for _ in range(cols * rows)
+    )
+    return cells, None, None
+
+
+def maze_map(cols, rows, rng):
+
+    """
+    Carve a perfect maze with an iterative depth-first search.
+
+    Passages sit on even coordinates and walls on odd ones, so every
+    free cell is reachable from every other one.
+
+    """
+
+    cells = bytearray(cols * rows)
+    cells[0] = 1
+    stack = [(0, 0)]
+    while stack:
+        x, y = stack[-1]
+        neighbours = [
+            (x + dx, y + dy)
+            for dx, dy in ((2, 0), (-2, 0), (0, 2), (0, -2))
+            if 0 <= x + dx < cols and 0 <= y + dy < rows and cells[(x + dx) * rows + y + dy] == 0
+        ]
+        if not neighbours:
+            stack.pop()
+            continue
+        nx, ny = rng.choice(neighbours)
+        cells[((x + nx) // 2) * rows + (y + ny) // 2] = 1  # Knock down the wall
+        cells[nx * rows + ny] = 1
+        stack.append((nx, ny))
+    end = ((cols - 1) // 2 * 2, (rows - 1) // 2 * 2)
+    return cells, (0, 0), end
+
+
+def rooms_map(cols, rows, rng, room_size=12):
+
+    """
+    Split the map into rooms by walls with one door per wall segment.
+
+    """
+
+    cells = bytearray(b"\x01") * (cols * rows)
+    for wall_x in range(room_size, cols, room_size):
+        for y in range(rows):
+            cells[wall_x * rows + y] = 0
+        for top in range(0, rows, room_size):
+            door = rng.randrange(top, min(top + room_size, rows))
+            cells[wall_x * rows + door] = 1
+    for wall_y in range(room_size, rows, room_size):
+        for x in range(cols):
+            if x % room_size:  # Leave the vertical walls alone
+                cells[x * rows + wall_y] = 0
+        for left in range(0, cols, room_size):
+            door = rng.randrange(left + 1, min(left + room_size, cols)) if left + 1 < cols else left
+            cells[door * rows + wall_y] = 1
+    cells[0] = cells[-1] = 1
+    return cells, (0, 0), (cols - 1, rows - 1)
+
+
+def costs_map(cols, rows, rng, patch_size=8):
+    # Square patches of random cost, with a few obstacles scattered over them
+    cells = bytearray(cols * rows)
+    patch_costs = {}
+    for x in range(cols):
+        for y in range(rows):
+            patch = (x // patch_size, y // patch_size)
+            if patch not in patch_costs:
+                patch_costs[patch] = rng.choice((1, 1, 1, 2, 3, 5, 9))
+            cells[x * rows + y] = 0 if rng.random() < 0.05 else patch_costs[patch]
+    cells[0] = cells[-1] = 1
+    return cells, (0, 0), (cols - 1, rows - 1)
+
+
+def make_map(kind, cols, rows, seed):
+
+    """
+    Build one benchmark map.
+
+    Args:
+        kind (str): One of MAP_KINDS.
+        cols (int): Width of the map.
+        rows (int): Height of the map.
+        seed (int): Seed for the random generator, so runs are repeatable.
+
+    Returns:
+        tuple: (FlatGrid, start, end).
+
+    """
+
+    rng = random.Random("{}-{}x{}-{}".format(kind, cols, rows, seed))
+    if kind == "open":
+        cells, start, end = open_map(cols, rows, rng)
+    elif kind.startswith("random"):
+        cells, start, end = random_map(cols, rows, rng, int(kind[6:]) / 100)
+    elif kind == "maze":
+        cells, start, end = maze_map(cols, rows, rng)
+    elif kind == "rooms":
+        cells, start, end = rooms_map(cols, rows, rng)
+    elif kind == "costs":
+        cells, start, end = costs_map(cols, rows, rng)
+    else:
+        raise ValueError("Unknown map kind: {}".format(kind))
+    grid = pathPlanner.FlatGrid.from_buffer(cells, cols, rows)
+
+    if start is None:
+        # Random maps: use the first and last cells of the largest
+        # component, so the search always has a path to find
+        components = pathPlanner.ComponentIndex(grid)
+        largest = max(components.sizes, key=components.sizes.get)
+        members = [i for i, label in enumerate(components.labels) if label == largest]
+        start = grid.cell(members[0])
+        end = grid.cell(members[-1])
+    return grid, start, end
+
+
+def measure(grid, start, end, mode, diagonal, repeat, memory=True):
+
+    """
+    Run one planner on one map.
+
+    The search is timed `repeat` times and the best time is kept. Peak
+    memory is taken from a separate run under tracemalloc, which would
+    otherwise slow down the timed runs. That run is many times slower than
+    a plain one, so it can be turned off with memory=False.
+
+    Returns:
+        dict: time_s, expanded, pushed, max_open, peak_kb and length.
+
+    """
+
+    # Messages are switched off, so they cost nothing in the timings
+    log = pathPlanner.MessageLog(None)
+
+    def search(stats=None):
+        return pathPlanner.plan(grid, start, end, log, mode, diagonal, stats=stats)
+
+    best = None
+    for _ in range(repeat):
+        stats = pathPlanner.SearchStats()
+        began = time.perf_counter()
+        path = search(stats)
+        elapsed = time.perf_counter() - began
+        if best is None or elapsed < best:
+            best = elapsed
+
+    peak_kb = None
+    if memory:
+        tracemalloc.start()
+        search()
+        peak_kb = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        tracemalloc.stop()
+
+    return {
+        "time_s": round(best, 6),
+        "expanded": stats.expanded,
+        "pushed": stats.pushed,
+        "max_open": stats.max_open,
+        "peak_kb": peak_kb,
+        "length": len(path),
+    }
+
+
+def parse_size(text):
+    cols, rows = text.lower().split("x")
+    return int(cols), int(rows)
+
+
+def run(args):
+    sizes = [parse_size(size) for size in args.sizes] if args.sizes else (
+        FULL_SIZES if args.full else DEFAULT_SIZES
+    )
+    results = []
+    for cols, rows in sizes:
+        for kind in args.kinds:
+            grid, start, end = make_map(kind, cols, rows, args.seed)
+            for mode in args.mode:
+                result = {
+                    "map": "{}-{}x{}".format(kind, cols, rows),
+                    "mode": mode,
+                    "diagonal": args.diagonal,
+                    "seed": args.seed,
+                }
+                result.update(measure(
+                    grid, start, end, mode, args.diagonal, args.repeat, not args.no_memory
+                ))
+                results.append(result)
+                print(
+                    "{map:<22} {mode:<6} {time_s:>10.4f}s {expanded!s:>9} expanded "
+                    "{peak_kb!s:>10} KiB  length {length}".format(**result),
+                    file=sys.stderr,
+                )
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+
+
+def compare(args):
+
+    """
+    Compare two result files and list the regressions.
+
+    A run regresses when it got slower or used more memory by more than
+    the threshold, expanded more nodes, or returned a path of a different
+    length. Returns the number of regressions.
+
+    """
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    def key(result):
+        return result["map"], result["mode"], result["diagonal"], result["seed"]
+
+    old_results = {key(result): result for result in baseline["results"]}
+    regressions = 0
+    for new in current["results"]:
+        old = old_results.get(key(new))
+        if old is None:
+            continue
+        problems = []
+        for field in ("time_s", "peak_kb"):
+            # Ignore noise on very short or very small runs
+            floor = 0.001 if field == "time_s" else 64
+            if old[field] is None or new[field] is None:
+                continue
+            if new[field] > max(old[field], floor) * (1 + args.threshold):
+                problems.append(
+                    "{} {} -> {} ({:+.0%})".format(
+                        field, old[field], new[field], new[field] / max(old[field], floor) - 1
+                    )
+                )
+        if old["expanded"] is not None and new["expanded"] is not None \
+                and new["expanded"] > old["expanded"]:
+            problems.append("expanded {} -> {}".format(old["expanded"], new["expanded"]))
+        if new["length"] != old["length"]:
+            problems.append("length {} -> {}".format(old["length"], new["length"]))
+
+        status = "REGRESSION" if problems else "ok"
+        print("{:<22} {:<6} {:<10} {}".format(new["map"], new["mode"], status, ", ".join(problems)))
+        regressions += bool(problems)
+
+    print("{} regression(s)".format(regressions))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the path planners.")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--output", default="benchmark.json", help="result file")
+    run_parser.add_argument("--sizes", nargs="+", help="map sizes such as 64x64")
+    run_parser.add_argument("--full", action="store_true", help="include 4096x4096 maps")
+    run_parser.add_argument("--kinds", nargs="+", default=MAP_KINDS, choices=MAP_KINDS)
+    run_parser.add_argument(
+        "--mode",
+        nargs="+",
+        default=["astar"],
+        choices=pathPlanner.planner_names(),
+    )
+    run_parser.add_argument("--diagonal", action="store_true", help="allow 8-connected moves")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--repeat", type=int, default=3, help="timed runs per search")
+    run_parser.add_argument(
+        "--no-memory", action="store_true", help="skip the (slow) peak memory measurement"
+    )
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="allowed relative slowdown or memory growth (default 0.1)",
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(1 if compare(args) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Headless batch runner for the path planners.
+
+Runs every query of one or more query files on a map and writes one JSON
+object per query and mode to stdout (or --output) as soon as it is solved.
+Nothing here imports PyQt, so it runs on machines without a display.
+
+Query files hold one query per line, either "start_col start_row end_col
+end_row" (spaces or commas) or a JSON list/object with the same four
+numbers. MovingAI .scen files are read too. Empty lines and lines starting
+with "#" are skipped.
+
+Example:
+    python cli.py warehouse.png queries.txt --mode astar --mode jps
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import pathPlanner
+from maps import load_map
+
+
+def read_queries(path):
+
+    """
+    Read (start, end) queries from a query file.
+
+    Args:
+        path (str): Path of the file.
+
+    Returns:
+        list: List of ((col, row) start, (col, row) end) pairs.
+
+    """
+
+    queries = []
+    with open(path) as f:
+        lines = f.read().splitlines()
+
+    if lines and lines[0].startswith("version"):
+        # MovingAI scenario: bucket, map, width, height, start x/y, goal x/y, length
+        for line in lines[1:]:
+            fields = line.split()
+            if len(fields) >= 8:
+                sx, sy, ex, ey = (int(value) for value in fields[4:8])
+                queries.append(((sx, sy), (ex, ey)))
+        return queries
+
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line[0] in "[{":
+            values = json.loads(line)
+            if isinstance(values, dict):
+                values = list(values["start"]) + list(values["end"])
+        else:
+            values = line.replace(",", " ").split()
+        sx, sy, ex, ey = (int(value) for value in values[:4])
+        queries.append(((sx, sy), (ex, ey)))
+    return queries
+
+
+def run(args, output):
+    grid = load_map(args.map)
+    queries = []
+    for query_file in args.queries:
+        queries.extend(read_queries(query_file))
+
+    # The component index labels every cell, which costs more than the
+    # queries themselves on a huge packed map, so it is off for those
+    # unless asked for
+    use_components = args.components
+    if use_components is None:
+        use_components = not args.map.lower().endswith(".grid")
+    components = pathPlanner.ComponentIndex(grid) if use_components else None
+    landmarks = None
+    if args.landmarks:
+        landmarks = pathPlanner.load_or_build_landmarks(grid, args.map, args.landmarks)
+    planners = {}  # Stateful planners, built once per mode
+    batch = None  # Worker pool for the plain modes, shared by all of them
+
+    def write(number, start, end, mode, path, seconds, bound=None):
+        record = {
+            "query": number,
+            "start": list(start),
+            "end": list(end),
+            "mode": mode,
+            "found": bool(path),
+            "timed_out": path is None,
+            "length": len(path) if path else 0,
+            "cost": pathPlanner.path_cost(grid, path) if path else None,
+            "time_ms": round(seconds * 1000, 3),
+        }
+        if bound is not None:
+            record["bound"] = bound if path else None
+        if args.paths and path:
+            record["path"] = [list(cell) for cell in path]
+        output.write(json.dumps(record, separators=(",", ":")) + "\n")
+        output.flush()
+
+    try:
+        for mode in args.mode or [pathPlanner.PLANNER_MODE]:
+            if args.workers > 1 and not pathPlanner.get_planner(mode).stateful:
+                # One pool and one shared copy of the grid serve every mode,
+                # and the answers stream out in order
+                if batch is None:
+                    batch = pathPlanner.BatchPlanner(grid, args.workers)
+                answers = batch.imap(queries, mode, args.diagonal, args.timeout, components)
+                for number, ((start, end), (path, stats, seconds)) in enumerate(
+                    zip(queries, answers)
+                ):
+                    bound = stats.bound if stats is not None else None
+                    write(number, start, end, mode, path, seconds, bound)
+                continue
+
+            for number, (start, end) in enumerate(queries):
+                began = time.perf_counter()
+                bound = None
+                if components is not None and not components.connected(start, end):
+                    path = []
+                elif pathPlanner.get_planner(mode).stateful:
+                    if mode not in planners:
+                        planners[mode] = pathPlanner.create_planner(grid, mode)
+                    path = planners[mode].plan(start, end)
+                else:
+                    should_stop = None
+                    if args.timeout is not None:
+                        deadline = time.monotonic() + args.timeout
+                        should_stop = lambda: time.monotonic() > deadline
+                    stats = pathPlanner.SearchStats()
+                    try:
+                        path = pathPlanner.plan(
+                            grid,
+                            start,
+                            end,
+                            None,
+                            mode,
+                            args.diagonal,
+                            should_stop,
+                            landmarks if mode == "astar" else None,
+                            stats=stats,
+                            time_budget=args.timeout,
+                        )
+                    except pathPlanner.SearchCancelled:
+                        path = None
+                    bound = stats.bound
+                write(number, start, end, mode, path, time.perf_counter() - began, bound)
+    finally:
+        if batch is not None:
+            batch.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run path planning queries on a map.")
+    parser.add_argument("map", help="map file (.png image, .grid packed map or text map)")
+    parser.add_argument("queries", nargs="+", help="query files")
+    parser.add_argument(
+        "--mode",
+        action="append",
+        choices=pathPlanner.planner_names(),
+        help="search mode, repeat to run several (default: PLANNER_MODE)",
+    )
+    parser.add_argument("--diagonal", action="store_true", help="allow 8-connected moves")
+    parser.add_argument("--paths", action="store_true", help="include the path cells")
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        help="time limit per query in seconds (the time budget in anytime mode)",
+    )
+    parser.add_argument("--workers", type=int, default=1, help="worker processes")
+    parser.add_argument(
+        "--landmarks",
+        type=int,
+        default=0,
+        help="use K ALT landmarks in astar mode, cached next to the map",
+    )
+    parser.add_argument(
+        "--components",
+        action="store_true",
+        default=None,
+        help="answer unconnected queries from a component index (default: on, "
+        "except for .grid maps)",
+    )
+    parser.add_argument("--no-components", action="store_false", dest="components")
+    parser.add_argument("--output", help="write results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            run(args, output)
+    else:
+        run(args, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,9 @@ from PyQt5.QtWidgets import (
     QWidget,
     QPushButton,
     QLineEdit,
-    QScrollArea,
+    QPlainTextEdit,
+    QFileDialog,
+    QComboBox,
 )
 from PyQt5.QtGui import (
     QPen,
@@ -17,14 +19,30 @@ from PyQt5.QtGui import (
     QIntValidator,
     QPainter,
     QResizeEvent,
+    QColor,
+    QImage,
+    QPixmap,
+    QTextCharFormat,
+    QTextCursor,
 )
-from PyQt5.QtCore import Qt, QPoint, QTimer
+from PyQt5.QtCore import Qt, QPoint, QRect, QTimer, QObject, QThread, pyqtSignal
 import math
 import importlib
+import os
+from collections import deque
+import time
 import pathPlanner
+import maps
+from occupancy import OccupancyGrid
 
 
 class MainWindow(QMainWindow):
+
+    # The path animation takes this long whatever the path length, drawing
+    # as many cells per frame as needed
+    PATH_ANIMATION_DURATION = 1.0  # seconds
+    FRAME_INTERVAL = 16  # milliseconds, about one frame at 60 Hz
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.layout = QVBoxLayout()
@@ -40,6 +58,23 @@ class MainWindow(QMainWindow):
         self.end_set = False  # Flag to indicate if end has been set
         self.grid_dimensions = [20, 10]
         self.checked_path = []
+        self.path_cursor = 0  # Number of path cells drawn so far
+        self.path_animation_start = 0
+        self.system_timer = QTimer(self)  # Drives the path animation
+        self.system_timer.setInterval(self.FRAME_INTERVAL)
+        self.system_timer.timeout.connect(self.animate_path)
+        self.map_planners = {}  # Stateful planners by mode, kept between runs
+        self.planner_mtime = self.planner_source_mtime()  # Of the loaded pathPlanner
+        self.components = None  # Connected regions, built on the first run
+        self.path_cache = pathPlanner.PathCache()
+        self.map_version = 0  # Changes whenever a new map is started
+        self.planner_thread = None  # Thread of the search in progress
+        self.planner_worker = None
+        self.search_query = None  # Cache key and ends of the running search
+        self.search_moves = None  # (diagonal, any_angle) of the running search
+        self.search_map_planner = None  # Map planner used by the running search
+        self.map_edited_during_search = False
+        self.pending_edits = []  # Map planner edits made during a search
 
         self.init_window()
         # Container widget to position widgets
@@ -61,8 +96,7 @@ class MainWindow(QMainWindow):
     def draw_console(self, parentLayout):
         console_layout = QHBoxLayout()
 
-        self.message_display = ScrollableLabel(self)
-        self.message_display.setText("")
+        self.message_display = MessageConsole(self)
         self.message_display.setMaximumHeight(80)
 
         self.clear_button = QPushButton("CLEAR")
@@ -81,8 +115,8 @@ class MainWindow(QMainWindow):
 
     def draw_control_panel(self, parentLayout):
         control_panel_layout = QHBoxLayout()
-        self.width_input = LabelledIntField("Width", 2, self.grid_dimensions[0])
-        self.height_input = LabelledIntField("Height", 2, self.grid_dimensions[1])
+        self.width_input = LabelledIntField("Width", 5, self.grid_dimensions[0])
+        self.height_input = LabelledIntField("Height", 5, self.grid_dimensions[1])
         self.width_input.show()  # Widget dimensions are not set until it is shown
 
         self.reset_button = QPushButton("Reset")
@@ -90,6 +124,16 @@ class MainWindow(QMainWindow):
         self.reset_button.setMaximumHeight(self.width_input.height())
         self.reset_button.clicked.connect(self.on_click_reset)
 
+        self.load_button = QPushButton("Load\nMap")
+        self.load_button.setStyleSheet("QPushButton { background-color: white }")
+        self.load_button.setMaximumHeight(self.width_input.height())
+        self.load_button.clicked.connect(self.on_click_load)
+
+        self.save_button = QPushButton("Save\nMap")
+        self.save_button.setStyleSheet("QPushButton { background-color: white }")
+        self.save_button.setMaximumHeight(self.width_input.height())
+        self.save_button.clicked.connect(self.on_click_save)
+
         self.obstacle_button = QPushButton("Add\nObstacles")
         self.obstacle_button.setStyleSheet("QPushButton { background-color: white }")
         self.obstacle_button.setMaximumHeight(self.width_input.height())
@@ -117,15 +161,32 @@ class MainWindow(QMainWindow):
         self.run_button.setMaximumHeight(self.width_input.height())
         self.run_button.clicked.connect(self.on_click_run)
 
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setStyleSheet("QPushButton { background-color: white }")
+        self.cancel_button.setMaximumHeight(self.width_input.height())
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.on_click_cancel)
+
+        self.progress_label = QLabel("")
+
+        self.planner_selector = QComboBox()
+        self.planner_selector.setMaximumHeight(self.width_input.height())
+        self.update_planner_selector()
+
         control_panel_layout.addWidget(self.width_input)
         control_panel_layout.addWidget(self.height_input)
         control_panel_layout.addWidget(self.reset_button)
+        control_panel_layout.addWidget(self.load_button)
+        control_panel_layout.addWidget(self.save_button)
         control_panel_layout.addWidget(self.obstacle_button)
         control_panel_layout.addWidget(self.obstacle_undo_button)
         control_panel_layout.addWidget(self.start_button)
         control_panel_layout.addWidget(self.end_button)
         control_panel_layout.addStretch(1)
+        control_panel_layout.addWidget(self.progress_label)
+        control_panel_layout.addWidget(self.planner_selector)
         control_panel_layout.addWidget(self.run_button)
+        control_panel_layout.addWidget(self.cancel_button)
 
         control_panel_layout.setSpacing(2)
         parentLayout.addLayout(control_panel_layout)
@@ -138,6 +199,7 @@ class MainWindow(QMainWindow):
             self.reset()
 
     def reset(self):
+        self.cancel_search()
         self.grid_dimensions = (
             self.width_input.get_value(),
             self.height_input.get_value(),
@@ -149,20 +211,61 @@ class MainWindow(QMainWindow):
             "INFO",
         )
         self.indicator.setStyleSheet("QLabel { background-color : grey; }")
+        self.canvas.clear()
         self.canvas.draw_grid(self.grid_dimensions[0], self.grid_dimensions[1])
-        self.canvas.obstacles = []
-        self.canvas.path = None
+        self.map_planners = {}
+        self.pending_edits = []
+        self.components = None
+        self.map_version += 1
+        self.path_cache.clear()
         self.start_set = False
-        self.canvas.start = None
-        self.start_set = False
-        self.canvas.end = None
+        self.end_set = False
 
     def on_click_clear(self):
-        self.message_display.setText("")
+        self.message_display.clear()
 
     def on_click_reset(self):
         self.reset()
 
+    def on_click_load(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Load map", "", "Maps (*.grid *.map *.txt *.png);;All files (*)"
+        )
+        if not path:
+            return
+        try:
+            grid = maps.load_map(path)
+        except (OSError, ValueError) as e:
+            self.display_message('Could not load "{}": {}'.format(path, e), "ERROR")
+            return
+
+        # Start a new map of the loaded size, then fill in its cells
+        self.width_input.set_value(grid.cols)
+        self.height_input.set_value(grid.rows)
+        self.reset()
+        self.canvas.obstacles = OccupancyGrid.from_grid(grid)
+        self.canvas.rebuild_image()
+        self.canvas.update()
+        self.display_message(
+            "Loaded {} ({} x {}, {} obstacles)".format(
+                path, grid.cols, grid.rows, len(self.canvas.obstacles)
+            ),
+            "INFO",
+        )
+
+    def on_click_save(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Save map", "", "Packed map (*.grid);;Text map (*.map)"
+        )
+        if not path:
+            return
+        try:
+            maps.save_map(self.create_grid(), path)
+        except (OSError, ValueError) as e:
+            self.display_message('Could not save "{}": {}'.format(path, e), "ERROR")
+            return
+        self.display_message("Saved map to {}".format(path), "INFO")
+
     def on_click_obstacle(self):
         self.obstacle_mode = not self.obstacle_mode
 
@@ -178,10 +281,9 @@ class MainWindow(QMainWindow):
 
     def on_click_obstacle_undo(self):
         if len(self.canvas.obstacles) > 0:
-            self.canvas.path = None
+            self.canvas.clear_path()
             self.indicator.setStyleSheet("QLabel { background-color : grey; }")
-            self.canvas.obstacles.pop()
-            self.canvas.update()
+            self.on_obstacle_changed(self.canvas.pop_obstacle(), False)
 
     def on_click_start(self):
         self.start_mode = not self.start_mode
@@ -215,20 +317,198 @@ class MainWindow(QMainWindow):
             self.indicator.setStyleSheet("QLabel { background-color : red; }")
             return
 
+        if self.planner_thread is not None:
+            self.display_message("A search is already running", "WARN")
+            return
+
         self.display_message("Running algorithm", "INFO")
         try:
-            importlib.reload(pathPlanner)
-            unchecked_path = pathPlanner.do_a_star(
-                self.create_grid(),
-                self.canvas.start,
-                self.canvas.end,
-                self.display_message,
+            self.reload_planner_if_changed()
+            mode = self.planner_selector.currentData()
+            engine = pathPlanner.get_planner(mode)
+            if self.components is None:
+                self.components = pathPlanner.ComponentIndex(self.create_grid())
+            if not self.components.connected(self.canvas.start, self.canvas.end):
+                self.display_message("Start and End are not connected", "ERROR")
+                self.indicator.setStyleSheet("QLabel { background-color : red; }")
+                return
+            cache_key = (
+                self.map_version,
+                mode,
+                pathPlanner.DIAGONAL_MOVES,
+            )
+            cached_path = self.path_cache.get(
+                cache_key, self.canvas.start, self.canvas.end
             )
+            if cached_path is not None:
+                self.display_message(
+                    "Using cached path ({} hits, {} misses)".format(
+                        self.path_cache.hits, self.path_cache.misses
+                    ),
+                    "INFO",
+                )
+                self.show_path(cached_path)
+                return
+
+            start = self.canvas.start
+            end = self.canvas.end
+            if engine.stateful:
+                # Reuse the planner's state instead of planning from scratch.
+                # A new planner is built on the worker thread and only
+                # adopted once its search has finished.
+                planners = [self.map_planners.get(mode), None]
+                if planners[0] is None:
+                    planners[1] = self.create_grid()
+                self.search_map_planner = (planners, mode)
+
+                def run_search(display_message, should_stop, progress):
+                    if planners[0] is None:
+                        planners[0] = engine.create(planners[1])
+                    pathPlanner.warn_ignored_costs(planners[0], mode, display_message)
+                    path = planners[0].plan(start, end, display_message)
+                    if pathPlanner.SHORTCUT_PATHS:
+                        # The planner's own grid is current, and FlatGrid
+                        # accepts anything with cols, rows and cells
+                        path = pathPlanner.shortcut_path(planners[0], path, True)
+                    return path
+
+            else:
+                self.search_map_planner = None
+                grid = self.create_grid()
+
+                def run_search(display_message, should_stop, progress):
+                    return pathPlanner.plan(
+                        grid,
+                        start,
+                        end,
+                        display_message,
+                        mode,
+                        should_stop=should_stop,
+                        progress=progress,
+                    )
+
         except Exception as e:
             self.display_message('Python: "{}"'.format(str(e)), "ERROR")
             self.indicator.setStyleSheet("QLabel { background-color : red; }")
             return
 
+        self.search_query = (cache_key, start, end)
+        self.search_moves = (
+            pathPlanner.DIAGONAL_MOVES,
+            engine.any_angle or pathPlanner.SHORTCUT_PATHS,
+        )
+        self.start_search(run_search)
+
+    def planner_source_mtime(self):
+        try:
+            return os.path.getmtime(pathPlanner.__file__)
+        except OSError:
+            return None
+
+    def reload_planner_if_changed(self):
+        # Re-import pathPlanner only when its source file has changed since
+        # it was loaded. Planner objects built by the old code are dropped,
+        # the component index and the map itself are kept.
+        mtime = self.planner_source_mtime()
+        if mtime == self.planner_mtime:
+            return
+        importlib.reload(pathPlanner)
+        self.planner_mtime = mtime
+        self.map_planners = {}
+        self.path_cache.clear()
+        self.update_planner_selector()
+        self.display_message("Reloaded pathPlanner", "INFO")
+
+    def update_planner_selector(self):
+        # Fill the selector with the registered engines, keeping the current
+        # choice if it is still registered
+        selected = self.planner_selector.currentData()
+        if selected not in pathPlanner.PLANNERS:
+            selected = pathPlanner.PLANNER_MODE
+        self.planner_selector.blockSignals(True)
+        self.planner_selector.clear()
+        for name in pathPlanner.planner_names():
+            engine = pathPlanner.get_planner(name)
+            self.planner_selector.addItem(engine.description or name, name)
+        self.planner_selector.setCurrentIndex(max(0, self.planner_selector.findData(selected)))
+        self.planner_selector.blockSignals(False)
+
+    def start_search(self, run_search):
+        # Run the search on a worker thread. Its results come back through
+        # queued signals, so the handlers below run on the GUI thread.
+        self.planner_thread = QThread()
+        self.planner_worker = PlannerWorker(run_search)
+        self.planner_worker.moveToThread(self.planner_thread)
+        self.planner_thread.started.connect(self.planner_worker.run)
+
+        self.planner_worker.message.connect(self.display_message)
+        self.planner_worker.progress.connect(self.on_search_progress)
+        self.planner_worker.finished.connect(self.on_search_finished)
+        self.planner_worker.failed.connect(self.on_search_failed)
+        self.planner_worker.done.connect(self.planner_thread.quit)
+        self.planner_thread.finished.connect(self.on_search_thread_finished)
+
+        self.map_edited_during_search = False
+        self.run_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        self.indicator.setStyleSheet("QLabel { background-color : yellow; }")
+        self.planner_thread.start()
+
+    def cancel_search(self):
+        # Ask the running search to stop, its result will be ignored
+        if self.planner_worker is not None:
+            self.planner_worker.cancel_requested = True
+
+    def on_click_cancel(self):
+        if self.planner_worker is not None and not self.planner_worker.cancel_requested:
+            self.display_message("Cancelling search", "INFO")
+            self.cancel_search()
+            self.indicator.setStyleSheet("QLabel { background-color : grey; }")
+            self.progress_label.setText("")
+
+    def on_search_progress(self, expanded, best_f):
+        if not self.planner_worker.cancel_requested:
+            self.progress_label.setText(
+                "{} expanded, f = {:.1f}".format(expanded, best_f)
+            )
+
+    def on_search_finished(self, path):
+        if self.planner_worker.cancel_requested:
+            return  # Cancelled or reset while it was running
+        if self.search_map_planner is not None:
+            planners, mode = self.search_map_planner
+            self.map_planners[mode] = planners[0]
+        if not self.map_edited_during_search:
+            # The cache needs the path's real cost to tell which removed
+            # obstacles could make it shorter
+            diagonal, any_angle = self.search_moves
+            if any_angle:
+                cost = pathPlanner.path_length(path)
+            else:
+                cost = pathPlanner.path_cost(self.create_grid(), path)
+            self.path_cache.put(*self.search_query, path, cost, diagonal, any_angle)
+        self.show_path(path)
+
+    def on_search_failed(self, error):
+        if self.planner_worker.cancel_requested:
+            return
+        self.display_message('Python: "{}"'.format(error), "ERROR")
+        self.indicator.setStyleSheet("QLabel { background-color : red; }")
+
+    def on_search_thread_finished(self):
+        self.planner_thread = None
+        self.planner_worker = None
+        self.search_map_planner = None
+        self.run_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+        self.progress_label.setText("")
+        # Obstacle edits made during the search can reach the map planners now
+        for planner in self.map_planners.values():
+            for cell, value in self.pending_edits:
+                planner.set_cell(cell, value)
+        self.pending_edits = []
+
+    def show_path(self, unchecked_path):
         if len(unchecked_path) == 0:
             self.display_message("No path returned", "ERROR")
             self.indicator.setStyleSheet("QLabel { background-color : red; }")
@@ -243,23 +523,34 @@ class MainWindow(QMainWindow):
                     break
                 self.indicator.setStyleSheet("QLabel { background-color : green; }")
 
-        if self.canvas.start in unchecked_path:
-            unchecked_path.remove(self.canvas.start)
-        if self.canvas.end in unchecked_path:
-            unchecked_path.remove(self.canvas.end)
+        # Leave out the start and end cells, without changing the list passed in
+        # (it may be the one kept in the path cache)
+        start = self.canvas.start
+        end = self.canvas.end
+        checked_path = [cell for cell in unchecked_path if cell != start and cell != end]
 
-        if len(unchecked_path) > 0:
+        if len(checked_path) > 0:
             self.display_message("Drawing path", "INFO")
-            self.checked_path = unchecked_path
-
-            self.canvas.path = []
-            self.system_timer = QTimer()
-            self.system_timer.setInterval(
-                int(1000 / len(self.checked_path))
-            )  # Convert to milliseconds
-            self.system_timer.timeout.connect(self.animate_path)
+            self.checked_path = checked_path
+            self.path_cursor = 0
+            self.path_animation_start = time.monotonic()
+
+            self.canvas.start_path()
             self.system_timer.start()
 
+    def on_obstacle_changed(self, cell, added):
+        # Pass obstacle edits on to planners and indexes that keep their
+        # own grid
+        if self.planner_thread is not None:
+            self.map_edited_during_search = True
+            self.pending_edits.append((cell, 0 if added else 1))
+        else:
+            for planner in self.map_planners.values():
+                planner.set_cell(cell, 0 if added else 1)
+        if self.components is not None:
+            self.components.set_cell(cell, 0 if added else 1)
+        self.path_cache.invalidate(cell, added)
+
     def check_inside_grid(self, cell):
         if (
             cell[0] < 0
@@ -278,37 +569,87 @@ class MainWindow(QMainWindow):
         return False
 
     def create_grid(self):
-        grid = [
-            [1 for x in range(self.grid_dimensions[1])]
-            for y in range(self.grid_dimensions[0])
-        ]
-        for obstacle in self.canvas.obstacles:
-            grid[obstacle[0]][obstacle[1]] = 0
-        return grid
+        # Copy of the obstacle store, already in the planner's flat layout
+        return self.canvas.obstacles.to_grid()
 
     def animate_path(self):
-        if len(self.checked_path) > 0 and self.canvas.path != None:
-            self.canvas.path.append(self.checked_path.pop(0))
-            self.canvas.update()
-        else:
+        # Draw every cell that is due by now, so the whole path takes
+        # PATH_ANIMATION_DURATION however many frames actually get drawn
+        if self.path_cursor >= len(self.checked_path) or self.canvas.path is None:
             self.system_timer.stop()
+            return
+        elapsed = time.monotonic() - self.path_animation_start
+        due = math.ceil(len(self.checked_path) * elapsed / self.PATH_ANIMATION_DURATION)
+        due = min(max(due, self.path_cursor + 1), len(self.checked_path))
+        self.canvas.add_path_cells(self.checked_path[self.path_cursor:due])
+        self.path_cursor = due
 
     def display_message(self, message, type="DEBUG"):
-        message = "[{}] {}".format(type, message)
-        if type == "DEBUG":
-            self.message_display.appendBlueText(message)
-        elif type == "ERROR":
-            self.message_display.appendRedText(message)
-        elif type == "INFO":
-            self.message_display.appendBlackText(message)
-        elif type == "WARN":
-            self.message_display.appendOrangeText(message)
-        else:
+        colour = MessageConsole.COLOURS.get(type)
+        if colour is None:
             return
-        self.message_display.scrollToTop()
+        self.message_display.append_message("[{}] {}".format(type, message), colour)
+
+
+class PlannerWorker(QObject):
+
+    """Runs one search on a QThread and reports back through signals."""
+
+    message = pyqtSignal(str, str)
+    progress = pyqtSignal(int, float)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    done = pyqtSignal()
+
+    # Progress signals are sent at most this often, in seconds
+    PROGRESS_INTERVAL = 1 / 60
+
+    def __init__(self, run_search):
+        super().__init__()
+        self.run_search = run_search
+        self.cancel_requested = False
+        self.last_progress = 0
+
+    def run(self):
+        try:
+            path = self.run_search(
+                self.send_message, self.should_stop, self.send_progress
+            )
+        except pathPlanner.SearchCancelled:
+            pass
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit(path)
+        self.done.emit()
+
+    def send_message(self, message, type="DEBUG"):
+        if not self.cancel_requested:
+            self.message.emit(str(message), type)
+
+    def should_stop(self):
+        return self.cancel_requested
+
+    def send_progress(self, expanded, best_f):
+        now = time.monotonic()
+        if now - self.last_progress >= self.PROGRESS_INTERVAL:
+            self.last_progress = now
+            self.progress.emit(expanded, best_f)
 
 
 class CanvasWidget(QWidget):
+
+    # Colours of the cells in the back buffer
+    FREE_COLOUR = QColor(Qt.white).rgb()
+    OBSTACLE_COLOUR = QColor(Qt.black).rgb()
+    START_COLOUR = QColor(Qt.green).rgb()
+    END_COLOUR = QColor(Qt.red).rgb()
+    PATH_COLOUR = QColor(Qt.blue).rgb()
+    BLOCKED_PATH_COLOUR = QColor(Qt.gray).rgb()
+
+    # Grid lines are only drawn when cells are at least this many pixels
+    MIN_CELL_SIZE_FOR_LINES = 4
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent = parent
@@ -317,24 +658,33 @@ class CanvasWidget(QWidget):
         self.setPalette(QtGui.QPalette(QtGui.QColor(255, 255, 255)))
         self.mouse_pressed = False
         self.grid = []
-        self.obstacles = []
+        self.obstacles = OccupancyGrid(*self.parent.grid_dimensions)
         self.path = None
+        self.path_cells = set()
         self.start = None
         self.end = None
+        self.columns = 0
+        self.rows = 0
         self.cell_width = 0
         self.cell_height = 0
         self.column_offset = 0
         self.row_offset = 0
+        # Back buffer with one pixel per cell, scaled up when painted
+        self.image = None
+        # Grid lines, drawn once per resize
+        self.grid_lines = None
 
     def draw_grid(self, columns, rows):
         self.grid = []
+        self.columns = columns
+        self.rows = rows
         width = self.width()
         height = self.height()
-        self.cell_width = math.floor(width / columns)
+        self.cell_width = max(1, math.floor(width / columns))
         self.column_offset = math.floor(
             (width % self.cell_width) / 2
         )  # Used to center the grid
-        self.cell_height = math.floor(height / rows)
+        self.cell_height = max(1, math.floor(height / rows))
         self.row_offset = math.floor(
             (height % self.cell_height) / 2
         )  # used to center the grid
@@ -359,8 +709,130 @@ class CanvasWidget(QWidget):
                     yc + self.row_offset,
                 )
             )
+
+        self.grid_lines = QPixmap(self.size())
+        self.grid_lines.fill(Qt.transparent)
+        if min(self.cell_width, self.cell_height) >= self.MIN_CELL_SIZE_FOR_LINES:
+            painter = QPainter(self.grid_lines)
+            pen = QPen()
+            pen.setWidth(2)
+            pen.setColor(Qt.black)
+            painter.setPen(pen)
+            for line in self.grid:
+                painter.drawLine(*line)
+            painter.end()
+
+        self.rebuild_image()
         self.update()
 
+    def rebuild_image(self):
+        # Redraw every cell into a new back buffer
+        self.image = QImage(self.columns, self.rows, QImage.Format_RGB32)
+        self.image.fill(self.FREE_COLOUR)
+        for obstacle in self.obstacles:
+            self.image.setPixel(obstacle[0], obstacle[1], self.OBSTACLE_COLOUR)
+        for cell in (self.start, self.end):
+            if cell is not None:
+                self.image.setPixel(cell[0], cell[1], self.free_cell_colour(cell))
+        for cell in self.path_cells:
+            if self.is_obstacle(cell):
+                self.image.setPixel(cell[0], cell[1], self.BLOCKED_PATH_COLOUR)
+            else:
+                self.image.setPixel(cell[0], cell[1], self.PATH_COLOUR)
+
+    def is_obstacle(self, cell):
+        return cell in self.obstacles
+
+    def free_cell_colour(self, cell):
+        # Colour of a cell that is not an obstacle
+        if cell in self.path_cells:
+            return self.PATH_COLOUR
+        if cell == self.start:
+            return self.START_COLOUR
+        if cell == self.end:
+            return self.END_COLOUR
+        return self.FREE_COLOUR
+
+    def refresh_cell(self, cell, colour):
+        # Redraw one cell in the back buffer and repaint only its area
+        if (
+            self.image is None
+            or not 0 <= cell[0] < self.image.width()
+            or not 0 <= cell[1] < self.image.height()
+        ):
+            return
+        self.image.setPixel(cell[0], cell[1], colour)
+        self.update(QRect(*self.cell_to_coords(cell)))
+
+    def clear(self):
+        self.obstacles = OccupancyGrid(*self.parent.grid_dimensions)
+        self.path = None
+        self.path_cells = set()
+        self.start = None
+        self.end = None
+
+    def add_obstacle(self, cell):
+        if self.obstacles.add(cell):
+            self.refresh_cell(cell, self.OBSTACLE_COLOUR)
+
+    def pop_obstacle(self):
+        cell = self.obstacles.undo()
+        self.refresh_cell(cell, self.free_cell_colour(cell))
+        return cell
+
+    def set_start(self, cell):
+        previous = self.start
+        self.start = cell
+        if previous is not None:
+            self.refresh_cell(previous, self.free_cell_colour(previous))
+        self.refresh_cell(cell, self.START_COLOUR)
+
+    def set_end(self, cell):
+        previous = self.end
+        self.end = cell
+        if previous is not None:
+            self.refresh_cell(previous, self.free_cell_colour(previous))
+        self.refresh_cell(cell, self.END_COLOUR)
+
+    def start_path(self):
+        self.clear_path()
+        self.path = []
+
+    def add_path_cells(self, cells):
+        # Draw a run of path cells into the back buffer, then repaint only
+        # the area they cover
+        if self.image is None or not cells:
+            return
+        self.path.extend(cells)
+        self.path_cells.update(cells)
+        for cell in cells:
+            # A path cell drawn over an obstacle is shown in grey
+            if self.is_obstacle(cell):
+                self.image.setPixel(cell[0], cell[1], self.BLOCKED_PATH_COLOUR)
+            else:
+                self.image.setPixel(cell[0], cell[1], self.PATH_COLOUR)
+        columns = [cell[0] for cell in cells]
+        rows = [cell[1] for cell in cells]
+        left, top = min(columns), min(rows)
+        self.update(
+            QRect(
+                left * self.cell_width + self.column_offset,
+                top * self.cell_height + self.row_offset,
+                (max(columns) - left + 1) * self.cell_width,
+                (max(rows) - top + 1) * self.cell_height,
+            )
+        )
+
+    def clear_path(self):
+        cells = self.path_cells
+        self.path = None
+        self.path_cells = set()
+        for cell in cells:
+            if self.is_obstacle(cell):
+                self.refresh_cell(cell, self.OBSTACLE_COLOUR)
+            else:
+                self.refresh_cell(cell, self.free_cell_colour(cell))
+
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
             self.mouse_pressed = True
@@ -368,7 +840,7 @@ class CanvasWidget(QWidget):
             if self.parent.start_mode:
 
                 # Remove the path and reset the indicator
-                self.path = None
+                self.clear_path()
                 self.parent.indicator.setStyleSheet(
                     "QLabel { background-color : grey; }"
                 )
@@ -383,13 +855,12 @@ class CanvasWidget(QWidget):
                     and start_cell[1] >= 0
                     and start_cell[1] < self.parent.grid_dimensions[1]
                 ):
-                    self.start = start_cell
+                    self.set_start(start_cell)
                     self.parent.start_set = True
-                    self.update()
             elif self.parent.end_mode:
 
                 # Remove the path and reset the indicator
-                self.path = None
+                self.clear_path()
                 self.parent.indicator.setStyleSheet(
                     "QLabel { background-color : grey; }"
                 )
@@ -404,16 +875,15 @@ class CanvasWidget(QWidget):
                     and end_cell[1] >= 0
                     and end_cell[1] < self.parent.grid_dimensions[1]
                 ):
-                    self.end = end_cell
+                    self.set_end(end_cell)
                     self.parent.end_set = True
-                    self.update()
 
     def mouseMoveEvent(self, event):
         if self.mouse_pressed:
             if self.parent.obstacle_mode:
 
                 # Remove the path and reset the indicator
-                self.path = None
+                self.clear_path()
                 self.parent.indicator.setStyleSheet(
                     "QLabel { background-color : grey; }"
                 )
@@ -429,15 +899,15 @@ class CanvasWidget(QWidget):
                     and obstacle_cell[1] >= 0
                     and obstacle_cell[1] < self.parent.grid_dimensions[1]
                 ):
-                    self.obstacles.append(obstacle_cell)
-                    self.update()
+                    self.add_obstacle(obstacle_cell)
+                    self.parent.on_obstacle_changed(obstacle_cell, True)
 
     def mouseReleaseEvent(self, event):
         if event.button() == Qt.LeftButton:
             if self.parent.obstacle_mode:
 
                 # Remove the path and reset the indicator
-                self.path = None
+                self.clear_path()
                 self.parent.indicator.setStyleSheet(
                     "QLabel { background-color : grey; }"
                 )
@@ -452,34 +922,40 @@ class CanvasWidget(QWidget):
                     and obstacle_cell[1] >= 0
                     and obstacle_cell[1] < self.parent.grid_dimensions[1]
                 ):
-                    self.obstacles.append(obstacle_cell)
+                    self.add_obstacle(obstacle_cell)
+                    self.parent.on_obstacle_changed(obstacle_cell, True)
             self.mouse_pressed = False
-            self.update()
 
     def paintEvent(self, event):
+        if self.image is None:
+            return
         painter = QPainter(self)
-        pen = QPen()
-        pen.setWidth(2)
-        pen.setColor(Qt.black)
-        painter.setPen(pen)
-
-        for obstacle in self.obstacles:
-            painter.fillRect(*self.cell_to_coords(obstacle), Qt.black)
-
-        if self.start:
-            painter.fillRect(*self.cell_to_coords(self.start), Qt.green)
-        if self.end:
-            painter.fillRect(*self.cell_to_coords(self.end), Qt.red)
+        area = event.rect()
 
-        if self.path:
-            for cell in self.path:
-                if cell not in self.obstacles:
-                    painter.fillRect(*self.cell_to_coords(cell), Qt.blue)
-                else:
-                    painter.fillRect(*self.cell_to_coords(cell), Qt.gray)
+        # Scale up only the cells that overlap the area being repainted
+        first_column = max(0, (area.left() - self.column_offset) // self.cell_width)
+        last_column = min(
+            self.columns - 1, (area.right() - self.column_offset) // self.cell_width
+        )
+        first_row = max(0, (area.top() - self.row_offset) // self.cell_height)
+        last_row = min(
+            self.rows - 1, (area.bottom() - self.row_offset) // self.cell_height
+        )
+        if first_column <= last_column and first_row <= last_row:
+            columns = last_column - first_column + 1
+            rows = last_row - first_row + 1
+            painter.drawImage(
+                QRect(
+                    first_column * self.cell_width + self.column_offset,
+                    first_row * self.cell_height + self.row_offset,
+                    columns * self.cell_width,
+                    rows * self.cell_height,
+                ),
+                self.image,
+                QRect(first_column, first_row, columns, rows),
+            )
 
-        for line in self.grid:
-            painter.drawLine(*line)
+        painter.drawPixmap(area, self.grid_lines, area)
 
     def get_selected_cell(self, pos):
         return (
@@ -524,60 +1000,73 @@ class LabelledIntField(QWidget):
     def get_value(self):
         return int(self.lineEdit.text())
 
+    def set_value(self, value):
+        self.lineEdit.setText(str(value))
 
-class ScrollableLabel(QScrollArea):
-
-    def __init__(self, *args, **kwargs):
-        QScrollArea.__init__(self, *args, **kwargs)
 
-        self.setWidgetResizable(True)
-        content = QWidget(self)
-        self.setWidget(content)
+class MessageConsole(QPlainTextEdit):
 
-        layout = QHBoxLayout(content)
+    """
+    Read-only message log that keeps only the newest MAX_MESSAGES lines.
 
-        self.label = QLabel(content)
+    Messages are queued and written once per frame, so a burst of
+    messages costs one update of the widget instead of one per message.
+    New messages are added at the bottom and the oldest lines are dropped
+    by the widget itself once the limit is reached.
+    """
 
-        self.label.setAlignment(Qt.AlignLeft | Qt.AlignTop)
+    MAX_MESSAGES = 500
+    FRAME_INTERVAL = 16  # milliseconds
 
-        self.label.setWordWrap(True)
+    # Text colour of each message type
+    COLOURS = {
+        "DEBUG": QColor(Qt.blue),
+        "ERROR": QColor(Qt.red),
+        "INFO": QColor(Qt.black),
+        "WARN": QColor(255, 165, 0),
+    }
 
-        layout.addWidget(self.label)
+    def __init__(self, *args, **kwargs):
+        QPlainTextEdit.__init__(self, *args, **kwargs)
+        self.setReadOnly(True)
+        self.setMaximumBlockCount(self.MAX_MESSAGES)
         self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
 
-    def setText(self, text):
-        self.label.setText(text)
-
-    def appendBlackText(self, text):
-        self.label.setText(text + "<br>" + self.label.text())
-
-    def appendRedText(self, text):
-        self.label.setText(
-            "<font color='Red'>" + text + "</font> " + "<br>" + self.label.text()
-        )
-
-    def appendGreenText(self, text):
-        self.label.setText(
-            "<font color='Green'>" + text + "</font> " + "<br>" + self.label.text()
-        )
+        # Messages waiting for the next frame, older ones fall off the front
+        self.pending = deque(maxlen=self.MAX_MESSAGES)
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.timeout.connect(self.flush)
 
-    def appendBlueText(self, text):
-        self.label.setText(
-            "<font color='Blue'>" + text + "</font> " + "<br>" + self.label.text()
-        )
+    def append_message(self, text, colour):
+        self.pending.append((text, colour))
+        if not self.flush_timer.isActive():
+            self.flush_timer.start(self.FRAME_INTERVAL)
 
-    def appendOrangeText(self, text):
-        self.label.setText(
-            "<font color='Orange'>" + text + "</font> " + "<br>" + self.label.text()
-        )
+    def flush(self):
+        if not self.pending:
+            return
+        cursor = QTextCursor(self.document())
+        cursor.beginEditBlock()
+        cursor.movePosition(QTextCursor.End)
+        text_format = QTextCharFormat()
+        for text, colour in self.pending:
+            if not self.document().isEmpty():
+                cursor.insertBlock()
+            text_format.setForeground(colour)
+            cursor.insertText(text, text_format)
+        cursor.endEditBlock()
+        self.pending.clear()
+        self.scrollToBottom()
+
+    def clear(self):
+        self.pending.clear()
+        QPlainTextEdit.clear(self)
 
     def scrollToBottom(self):
         self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
 
-    def scrollToTop(self):
-        self.verticalScrollBar().setValue(self.verticalScrollBar().minimum())
-
 
 app = QApplication(sys.argv)
 app.setStyle("Fusion")
@@ -0,0 +1,379 @@
+"""
+Loading maps from files, for use without the GUI.
+
+Maps are returned as pathPlanner.FlatGrid objects (0 for an obstacle,
+otherwise the cost of entering the cell, normally 1). Three formats are
+read:
+
+- Text maps, one line per row and one character per column. "#", "@",
+  "T", "O", "W" and "0" are obstacles, the digits "1" to "9" are cells
+  with that cost and anything else is walkable with cost 1. A MovingAI
+  header (type/height/width/map lines) is skipped.
+- PNG images, one pixel per cell. Dark pixels are obstacles.
+- Packed maps (.grid), the cell values byte for byte in the planner's own
+  flat layout. They are memory-mapped instead of read, so opening one is
+  instant whatever its size, and a search on one reads only the pages of
+  cells it looks at.
+
+Text and packed maps can also be written, see save_map.
+"""
+
+import mmap
+import struct
+
+from pathPlanner import FlatGrid
+
+
+# Characters that mark an obstacle in a text map
+OBSTACLE_CHARACTERS = set("#@TOW0")
+
+# Characters that give a cell its traversal cost in a text map
+COST_CHARACTERS = set("123456789")
+
+# PNG pixels darker than this (0-255) are obstacles
+PNG_THRESHOLD = 128
+
+# Header of a packed map: magic, format version, cols, rows, the offset of
+# the cells and the lowest walkable cell value (0 if there is none, and
+# missing in version 1 files). The cells start on a page boundary, so every
+# page of the mapping holds cells only.
+PACKED_MAGIC = b"GRIDMAP\0"
+PACKED_VERSION = 2
+PACKED_HEADER = struct.Struct("<8sIIIII")
+PACKED_DATA_OFFSET = 4096
+
+
+def load_map(path):
+
+    """
+    Load a map file, choosing the reader from the file extension.
+
+    Args:
+        path (str): Path of a .png image, a .grid packed map or a text
+            map.
+
+    Returns:
+        FlatGrid: The map. For a .grid file its cells are a read-only,
+        memory-mapped view of the file (see load_packed_map), so the map
+        is not read into memory up front and setting a cell raises
+        TypeError. Use load_packed_map(path, writable=True) for a map
+        that takes edits.
+
+    """
+
+    if path.lower().endswith(".png"):
+        return load_png_map(path)
+    if path.lower().endswith(".grid"):
+        return load_packed_map(path, writable=False)
+    return load_text_map(path)
+
+
+def save_map(grid, path):
+
+    """
+    Save a map, choosing the format from the file extension.
+
+    Args:
+        grid: Map in any form FlatGrid accepts.
+        path (str): Path of a .grid packed map or a text map.
+
+    """
+
+    if path.lower().endswith(".png"):
+        raise ValueError("Saving PNG maps is not supported, use .grid or a text map")
+    if path.lower().endswith(".grid"):
+        save_packed_map(grid, path)
+    else:
+        save_text_map(grid, path)
+
+
+def load_text_map(path):
+
+    """
+    Load a text map.
+
+    Args:
+        path (str): Path of the file.
+
+    Returns:
+        FlatGrid: The map. Short lines are padded with walkable cells.
+
+    """
+
+    with open(path) as f:
+        lines = f.read().splitlines()
+
+    # Skip a MovingAI header, which ends with a line reading "map"
+    if lines and lines[0].startswith("type"):
+        for i, line in enumerate(lines):
+            if line.strip() == "map":
+                lines = lines[i + 1:]
+                break
+    while lines and not lines[-1].strip():
+        lines.pop()
+    if not lines:
+        raise ValueError("{} contains no map".format(path))
+
+    rows = len(lines)
+    cols = max(len(line) for line in lines)
+    cells = bytearray(b"\x01") * (cols * rows)
+    for y, line in enumerate(lines):
+        for x, character in enumerate(line):
+            if character in OBSTACLE_CHARACTERS:
+                cells[x * rows + y] = 0
+            elif character in COST_CHARACTERS:
+                cells[x * rows + y] = int(character)
+    return FlatGrid.from_buffer(cells, cols, rows)
+
+
+def save_text_map(grid, path):
+
+    """
+    Save a map as a MovingAI-style text map that load_text_map reads back.
+
+    Obstacles are written as "@", cells with cost 1 as "." and higher
+    costs as their digit.
+
+    Args:
+        grid: Map in any form FlatGrid accepts.
+        path (str): Path of the file.
+
+    """
+
+    flat = FlatGrid(grid)
+    characters = ["@", "."] + [str(cost) for cost in range(2, 10)]
+    lines = ["type octile", "height {}".format(flat.rows), "width {}".format(flat.cols), "map"]
+    for y in range(flat.rows):
+        line = []
+        for x in range(flat.cols):
+            value = flat.cells[x * flat.rows + y]
+            if value >= len(characters):
+                raise ValueError(
+                    "Cell ({}, {}) costs {}, text maps only hold costs up to 9".format(x, y, value)
+                )
+            line.append(characters[value])
+        lines.append("".join(line))
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def load_packed_map(path, writable=True):
+
+    """
+    Open a packed map without reading it.
+
+    The file is memory-mapped and the grid's cells are a view of the
+    mapping, so the operating system loads a page of cells the first time
+    something reads it. Cells are stored column by column, which keeps
+    each page to a run of one column. The cheapest cell cost comes from
+    the header, so a search that stays in a small region of a huge map
+    reads only a few pages per column it crosses. On maps of more than
+    pathPlanner.SPARSE_STATE_CELLS cells the searches also keep their
+    per-node state for the cells they reach only. Anything that walks the
+    whole map still reads all of it: ComponentIndex, LandmarkTable and the
+    stateful planners ("dstar", "hpa", "flow") copy or label every cell.
+
+    Args:
+        path (str): Path of the file.
+        writable (bool): Allow edits to the cells (for planners that take
+            obstacle edits, such as "dstar"). Edits stay in memory and are
+            never written back to the file. With False the cells are
+            read-only.
+
+    Returns:
+        FlatGrid: The map.
+
+    """
+
+    with open(path, "rb") as f:
+        header = f.read(PACKED_HEADER.size)
+        if len(header) < PACKED_HEADER.size:
+            raise ValueError("{} is not a packed map".format(path))
+        magic, version, cols, rows, offset, min_cost = PACKED_HEADER.unpack(header)
+        if magic != PACKED_MAGIC:
+            raise ValueError("{} is not a packed map".format(path))
+        if version == 1:
+            min_cost = 0  # Not stored yet, the planner finds it when needed
+        elif version != PACKED_VERSION:
+            raise ValueError("{} has unsupported packed map version {}".format(path, version))
+        if cols * rows == 0:
+            raise ValueError("{} contains no map".format(path))
+        # The mapping stays valid after the file is closed
+        mapping = mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_COPY if writable else mmap.ACCESS_READ
+        )
+    if len(mapping) < offset + cols * rows:
+        mapping.close()
+        raise ValueError("{} is truncated".format(path))
+    flat = FlatGrid.from_buffer(memoryview(mapping)[offset:], cols, rows)
+    flat.min_cost = min_cost or None
+    return flat
+
+
+def save_packed_map(grid, path, chunk_size=1 << 20):
+
+    """
+    Save a map as a packed map.
+
+    Args:
+        grid: Map in any form FlatGrid accepts, including a packed map
+            opened with load_packed_map.
+        path (str): Path of the file.
+        chunk_size (int): Cells written at a time, so copying a large
+            memory-mapped map never holds all of it in memory.
+
+    """
+
+    flat = FlatGrid(grid)
+    cells = memoryview(flat.cells).cast("B")
+    min_cost = 256  # Lowest walkable value, found while the cells are written
+    with open(path, "wb") as f:
+        f.seek(PACKED_DATA_OFFSET)
+        for position in range(0, len(flat), chunk_size):
+            chunk = bytes(cells[position:min(position + chunk_size, len(flat))])
+            f.write(chunk)
+            for value in range(1, min_cost):
+                if value in chunk:
+                    min_cost = value
+                    break
+        header = PACKED_HEADER.pack(
+            PACKED_MAGIC, PACKED_VERSION, flat.cols, flat.rows, PACKED_DATA_OFFSET,
+            min_cost if min_cost < 256 else 0,
+        )
+        f.seek(0)
+        f.write(header.ljust(PACKED_DATA_OFFSET, b"\0"))
+
+
+def load_png_map(path):
+
+    """
+    Load a PNG image as a map, one pixel per cell.
+
+    Grayscale, RGB, palette and alpha images of any bit depth are read,
+    interlaced images are not. Transparent pixels are walkable.
+
+    Args:
+        path (str): Path of the image.
+
+    Returns:
+        FlatGrid: The map.
+
+    """
+
+    cols, rows, luminance = _read_png(path)
+    cells = bytearray(cols * rows)
+    for y in range(rows):
+        line = luminance[y * cols:(y + 1) * cols]
+        for x in range(cols):
+            if line[x] >= PNG_THRESHOLD:
+                cells[x * rows + y] = 1
+    return FlatGrid.from_buffer(cells, cols, rows)
+
+
+def _read_png(path):
+    # Decode a PNG into its size and a row-major bytearray of luminance
+    import zlib
+
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:8] != b"\x89PNG\r\n\x1a\n":
+        raise ValueError("{} is not a PNG image".format(path))
+
+    position = 8
+    palette = None
+    transparency = None
+    compressed = []
+    while position < len(data):
+        length, kind = struct.unpack(">I4s", data[position:position + 8])
+        chunk = data[position + 8:position + 8 + length]
+        position += 12 + length
+        if kind == b"IHDR":
+            width, height, depth, colour_type, _, _, interlace = struct.unpack(
+                ">IIBBBBB", chunk
+            )
+        elif kind == b"PLTE":
+            palette = chunk
+        elif kind == b"tRNS":
+            transparency = chunk
+        elif kind == b"IDAT":
+            compressed.append(chunk)
+        elif kind == b"IEND":
+            break
+    if interlace:
+        raise ValueError("Interlaced PNG images are not supported")
+
+    channels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}[colour_type]
+    bits_per_pixel = channels * depth
+    stride = (width * bits_per_pixel + 7) // 8
+    step = max(1, bits_per_pixel // 8)  # Filter distance in bytes
+    raw = zlib.decompress(b"".join(compressed))
+
+    # Undo the per-line filters
+    pixels = bytearray(stride * height)
+    previous = bytearray(stride)
+    for y in range(height):
+        start = y * (stride + 1)
+        kind = raw[start]
+        line = bytearray(raw[start + 1:start + 1 + stride])
+        if kind == 1:
+            for i in range(step, stride):
+                line[i] = (line[i] + line[i - step]) & 0xFF
+        elif kind == 2:
+            for i in range(stride):
+                line[i] = (line[i] + previous[i]) & 0xFF
+        elif kind == 3:
+            for i in range(stride):
+                left = line[i - step] if i >= step else 0
+                line[i] = (line[i] + ((left + previous[i]) >> 1)) & 0xFF
+        elif kind == 4:
+            for i in range(stride):
+                a = line[i - step] if i >= step else 0
+                b = previous[i]
+                c = previous[i - step] if i >= step else 0
+                p = a + b - c
+                pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+                if pa <= pb and pa <= pc:
+                    predictor = a
+                elif pb <= pc:
+                    predictor = b
+                else:
+                    predictor = c
+                line[i] = (line[i] + predictor) & 0xFF
+        pixels[y * stride:(y + 1) * stride] = line
+        previous = line
+
+    # Convert every pixel to an 8-bit luminance
+    luminance = bytearray(width * height)
+    sample_bytes = max(1, depth // 8)
+    maximum = (1 << depth) - 1
+    for y in range(height):
+        line = pixels[y * stride:(y + 1) * stride]
+        for x in range(width):
+            if depth < 8:
+                bit = x * depth
+                samples = [(line[bit // 8] >> (8 - depth - bit % 8)) & maximum]
+            else:
+                offset = x * channels * sample_bytes
+                # Only the high byte of 16-bit samples matters here
+                samples = [
+                    line[offset + i * sample_bytes] for i in range(channels)
+                ]
+            if colour_type == 3:
+                index = samples[0]
+                r, g, b = palette[index * 3:index * 3 + 3]
+                alpha = 255
+                if transparency is not None and index < len(transparency):
+                    alpha = transparency[index]
+            else:
+                if depth < 8:
+                    samples = [samples[0] * 255 // maximum]
+                if colour_type in (0, 4):
+                    r = g = b = samples[0]
+                else:
+                    r, g, b = samples[:3]
+                alpha = samples[-1] if colour_type in (4, 6) else 255
+            if alpha < 128:
+                luminance[y * width + x] = 255
+            else:
+                luminance[y * width + x] = (r * 299 + g * 587 + b * 114) // 1000
+    return width, height, luminance
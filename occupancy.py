@@ -0,0 +1,131 @@
+"""
+Obstacle store used by the GUI.
+
+Cells are kept in the same flat layout as pathPlanner.FlatGrid (index
+col * rows + row, 1 for walkable and 0 for an obstacle), so the store can
+be handed to the planner without building a grid first.
+"""
+
+
+class OccupancyGrid:
+
+    """
+    Obstacle cells with O(1) membership tests and an undo stack.
+
+    The object has the cols, rows and cells attributes the planner reads,
+    so it can be passed to pathPlanner functions directly. Use to_grid for
+    a copy that later edits will not change.
+
+    Args:
+        cols (int): Number of columns.
+        rows (int): Number of rows.
+
+    """
+
+    def __init__(self, cols, rows):
+        self.cols = cols
+        self.rows = rows
+        self.cells = bytearray(b"\x01") * (cols * rows)
+        self.history = []  # Obstacles in the order they were added
+        self.min_cost = 1  # Lowest walkable cell value, read by the planner
+
+    def __len__(self):
+        return len(self.history)
+
+    def __iter__(self):
+        return iter(self.history)
+
+    def __contains__(self, cell):
+        x, y = cell
+        return 0 <= x < self.cols and 0 <= y < self.rows and self.cells[x * self.rows + y] == 0
+
+    def add(self, cell):
+
+        """
+        Add an obstacle.
+
+        Args:
+            cell (tuple): (col, row) of the obstacle.
+
+        Returns:
+            bool: True if the cell was added, False if it is outside the
+                  grid or already an obstacle.
+
+        """
+
+        x, y = cell
+        if not (0 <= x < self.cols and 0 <= y < self.rows):
+            return False
+        index = x * self.rows + y
+        if self.cells[index] == 0:
+            return False
+        self.cells[index] = 0
+        self.history.append(cell)
+        return True
+
+    def undo(self):
+
+        """
+        Remove the most recently added obstacle.
+
+        Returns:
+            tuple: (col, row) of the removed obstacle, or None if there
+                   are no obstacles.
+
+        """
+
+        if not self.history:
+            return None
+        cell = self.history.pop()
+        self.cells[cell[0] * self.rows + cell[1]] = 1
+        self.min_cost = 1
+        return cell
+
+    @classmethod
+    def from_grid(cls, grid):
+
+        """
+        Build a store holding the cells of a planner grid.
+
+        Args:
+            grid: Any object with flat cols, rows and cells attributes,
+                  such as a pathPlanner.FlatGrid or a map from maps.py.
+
+        Returns:
+            OccupancyGrid: A store with a copy of the cells. Its
+                           obstacles are on the undo stack in flat index
+                           order, and cells keep their traversal costs.
+
+        """
+
+        store = cls(grid.cols, grid.rows)
+        store.cells = bytearray(grid.cells)
+        rows = grid.rows
+        store.history = []
+        min_cost = 256
+        for index, value in enumerate(store.cells):
+            if value == 0:
+                store.history.append(divmod(index, rows))
+            elif value < min_cost:
+                min_cost = value
+        store.min_cost = min_cost if min_cost < 256 else 1
+        return store
+
+    def to_grid(self):
+
+        """
+        Return a copy of the cells as a planner-ready grid.
+
+        Returns:
+            OccupancyGrid: A copy with the same cells and no undo history,
+                           accepted by every pathPlanner function.
+
+        """
+
+        grid = OccupancyGrid.__new__(OccupancyGrid)
+        grid.cols = self.cols
+        grid.rows = self.rows
+        grid.cells = bytes(self.cells)
+        grid.history = []
+        grid.min_cost = self.min_cost
+        return grid
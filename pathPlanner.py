@@ -1,5 +1,215 @@
 # Import any libraries required
+from array import array
+from collections import OrderedDict
+import hashlib
+import heapq
+import os
 import random
+import re
+import struct
+import sys
+import time
+
+
+# Searches that accept should_stop and progress callbacks call them once
+# every this many expansions, so the checks cost next to nothing
+STOP_CHECK_INTERVAL = 1024
+
+
+class SearchCancelled(Exception):
+    """Raised by a search when its should_stop callback returns True."""
+
+
+# Message types in increasing order of importance. Messages of a type below
+# MESSAGE_LEVEL are dropped by MessageLog before they are even formatted.
+MESSAGE_LEVELS = {"DEBUG": 10, "INFO": 20, "WARN": 30, "ERROR": 40}
+MESSAGE_LEVEL = "DEBUG"
+
+
+class MessageLog:
+
+    """
+    Lazy, level-gated wrapper around a display_message function.
+
+    Messages are passed as a format string and its arguments and are only
+    formatted when their type is at or above the log level, so a disabled
+    "Path found! Path: {}" message never turns the path into a string.
+    A MessageLog has the same call signature as display_message and can be
+    passed to do_a_star in its place to choose the level.
+
+    Args:
+        display_message (function): Function to display messages in GUI,
+            or None to drop every message.
+        level (str): Lowest message type shown, defaults to MESSAGE_LEVEL.
+
+    """
+
+    def __init__(self, display_message, level=None):
+        self.display_message = display_message
+        self.level = MESSAGE_LEVEL if level is None else level
+        if display_message is None or display_message is _no_message:
+            self.min_level = float("inf")
+        else:
+            self.min_level = MESSAGE_LEVELS[self.level]
+
+    @classmethod
+    def wrap(cls, display_message):
+        """Return display_message as a MessageLog, wrapping it if needed."""
+        if isinstance(display_message, cls):
+            return display_message
+        return cls(display_message)
+
+    def enabled(self, type="DEBUG"):
+        """Return True if messages of this type are shown."""
+        return MESSAGE_LEVELS.get(type, 0) >= self.min_level
+
+    def __call__(self, message, *args, type="DEBUG"):
+        if MESSAGE_LEVELS.get(type, 0) >= self.min_level:
+            if args:
+                message = message.format(*args)
+            if type == "DEBUG":
+                # Callers written for the plain display_message(message)
+                # form only take one argument
+                self.display_message(message)
+            else:
+                self.display_message(message, type)
+
+
+class SearchStats:
+
+    """
+    Counters and timings of one search.
+
+    Pass an instance as the stats argument of a search and it is filled in
+    when the search returns (or is cancelled).
+
+    Attributes:
+        expanded (int): Nodes taken off the open set and expanded.
+        pushed (int): Entries pushed onto the open set.
+        stale (int): Outdated open set entries that were skipped.
+        reopened (int): Expanded nodes that were put back on the open set.
+        max_open (int): Largest size of the open set.
+        times (dict): Seconds spent in each phase of the search, such as
+            "setup", "search" and "path".
+        bound (float): Suboptimality bound of the path found, set by the
+            searches whose paths may cost more than the optimum, such as
+            do_anytime_search. None otherwise.
+
+    """
+
+    def __init__(self):
+        self.expanded = 0
+        self.pushed = 0
+        self.stale = 0
+        self.reopened = 0
+        self.max_open = 0
+        self.times = {}
+        self.bound = None
+
+    def as_dict(self):
+        """Return the stats as a plain dictionary, e.g. for JSON."""
+        return {
+            "expanded": self.expanded,
+            "pushed": self.pushed,
+            "stale": self.stale,
+            "reopened": self.reopened,
+            "max_open": self.max_open,
+            "times": dict(self.times),
+            "bound": self.bound,
+        }
+
+    def __repr__(self):
+        return "SearchStats({})".format(
+            ", ".join("{}={!r}".format(k, v) for k, v in self.as_dict().items())
+        )
+
+
+class FlatGrid:
+
+    """
+    Flat, column-major view of a planner grid.
+
+    The planner works on a single contiguous buffer of cell values instead
+    of nested lists. Cell (col, row) is stored at index col * rows + row,
+    a value of 0 is an obstacle and any other value is walkable.
+
+    Args:
+        grid: Either a list of columns (list of list), a 2D NumPy array
+              of shape (cols, rows), or any object that already has flat
+              cols, rows and cells attributes (such as another FlatGrid).
+              A C-contiguous uint8 array is used in place without copying,
+              other arrays are converted once.
+
+    Attributes:
+        min_cost (int): Lowest value of a walkable cell, or None until a
+            search has needed it. Searches find it once and keep it here,
+            and a FlatGrid made from another FlatGrid shares it. Set it
+            back to None after giving a cell a lower value than min_cost;
+            other edits leave it valid.
+
+    """
+
+    def __init__(self, grid):
+        self.min_cost = None
+        if hasattr(grid, "cells"):
+            self.cols = grid.cols
+            self.rows = grid.rows
+            self.cells = grid.cells
+            self.min_cost = getattr(grid, "min_cost", None)
+        elif hasattr(grid, "shape"):
+            # NumPy array, viewed as a flat byte buffer
+            if grid.dtype != "uint8" or not grid.flags["C_CONTIGUOUS"]:
+                grid = grid.astype("uint8", order="C")
+            self.cols, self.rows = grid.shape
+            self.cells = memoryview(grid).cast("B")
+        else:
+            # List of columns, packed into a bytearray
+            self.cols = len(grid)
+            self.rows = len(grid[0])
+            self.cells = bytearray(self.cols * self.rows)
+            for x, column in enumerate(grid):
+                self.cells[x * self.rows:(x + 1) * self.rows] = bytes(column)
+
+    def __len__(self):
+        return self.cols * self.rows
+
+    def index(self, cell):
+        """Return the flat index of a (col, row) cell."""
+        return cell[0] * self.rows + cell[1]
+
+    def cell(self, index):
+        """Return the (col, row) cell at a flat index."""
+        return divmod(index, self.rows)
+
+    def in_bounds(self, cell):
+        return 0 <= cell[0] < self.cols and 0 <= cell[1] < self.rows
+
+    def is_free(self, cell):
+        """Return True if the cell is inside the grid and walkable."""
+        return self.in_bounds(cell) and self.cells[self.index(cell)] != 0
+
+    @classmethod
+    def from_buffer(cls, buffer, cols, rows):
+        """Wrap an existing flat buffer of cols * rows cell values."""
+        flat = cls.__new__(cls)
+        flat.cols = cols
+        flat.rows = rows
+        flat.cells = memoryview(buffer).cast("B")[:cols * rows]
+        flat.min_cost = None
+        return flat
+
+
+def _neighbors(index, cols, rows):
+    # Flat indices of the 4-connected neighbours of a cell inside the grid
+    x, y = divmod(index, rows)
+    if x > 0:
+        yield index - rows
+    if x < cols - 1:
+        yield index + rows
+    if y > 0:
+        yield index - 1
+    if y < rows - 1:
+        yield index + 1
 
 
 # The main path planning function. Additional functions, classes, 
@@ -15,87 +225,3579 @@ def do_a_star(grid, start, end, display_message):
     Perform A* pathfinding on a given grid.
 
     Args:
-        grid (list of list): 2D grid where 1 is walkable, 0 is an obstacle.
+        grid (list of list or numpy.ndarray): 2D grid indexed as grid[col][row]
+            where 0 is an obstacle and any other value (1 to 255) is the
+            cost of entering the cell.
+        start (tuple): (col, row) start position.
+        end (tuple): (col, row) goal position.
+        display_message (function): Function to display messages in GUI.
+
+    Returns:
+        list: Cheapest path from start to end as a list of (col, row), the
+              shortest one in steps on a grid of 1s and 0s. Returns an
+              empty list if no path is found.
+
+    """
+
+    return a_star_search(grid, start, end, display_message)
+
+
+def a_star_search(grid, start, end, display_message, should_stop=None, landmarks=None,
+                  progress=None, stats=None, on_expand=None, diagonal=False):
+
+    """
+    A* search behind do_a_star, with the extra options it cannot take.
+
+    Cell values other than 0 are the cost of entering the cell, so a grid
+    of 1s and 0s gives the usual shortest path in steps. A diagonal step
+    costs sqrt(2) times the cell value.
+
+    Args:
+        grid (list of list or numpy.ndarray): Grid as accepted by do_a_star.
         start (tuple): (col, row) start position.
         end (tuple): (col, row) goal position.
         display_message (function): Function to display messages in GUI.
+        should_stop (function): Optional function polled every
+            STOP_CHECK_INTERVAL expansions. The search raises
+            SearchCancelled as soon as it returns True.
+        landmarks (LandmarkTable): Optional landmark distances built for
+            this grid. The heuristic becomes the larger of the distance
+            heuristic and the ALT lower bound. Ignored with diagonal moves,
+            where the 4-connected landmark distances are not lower bounds.
+        progress (function): Optional function called every
+            STOP_CHECK_INTERVAL expansions with the number of nodes
+            expanded so far and the f(n) of the node being expanded.
+        stats (SearchStats): Optional stats object, filled in with the
+            counters and phase timings of this search.
+        on_expand (function): Optional function called with the cell,
+            g(n) and f(n) of every node as it is expanded.
+        diagonal (bool): Allow 8-connected moves. Diagonal steps may not
+            cut the corner of an obstacle.
 
     Returns:
-        list: Shortest path from start to end as a list of (col, row).
+        list: Cheapest path from start to end as a list of (col, row).
               Returns an empty list if no path is found.
 
     """
 
+    began = time.perf_counter()
+    log = MessageLog.wrap(display_message)
 
-    # Get the size of the grid
-    COL = len(grid)      # Number of columns
-    ROW = len(grid[0])   # Number of rows
+    # Flatten the grid so every per-node lookup is a single index
+    flat = FlatGrid(grid)
+    COL = flat.cols      # Number of columns
+    ROW = flat.rows      # Number of rows
+    cells = flat.cells
     
-    # Allowed movements (up, down, left, right)
-    moves = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+    # Allowed movements as (dcol, drow, index offset, step length), built
+    # once so the inner loop only unpacks them
+    moves = _moves(ROW, diagonal)
     
-    # Heuristic function (Euclidean distance) (h(n))
-    def heuristic(a, b):
-        return ((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2) ** 0.5
-    
-    # This list stores tuples of (f(n), (col, row))
-    open_set = [(0, start)]  
+    # Heuristic function (h(n)): Manhattan distance for 4-connected moves,
+    # octile distance for 8-connected ones, times the cheapest cell cost
+    end_x, end_y = end
+    min_cost = _grid_min_cost(grid, flat)
+    heuristic = _distance_heuristic(end_x, end_y, diagonal, min_cost)
+
+    if landmarks is not None and not diagonal:
+        # ALT heuristic: triangle inequality bounds from landmark distances,
+        # which count steps, so scale them by the cheapest cell cost too
+        distance = heuristic
+        landmark_bound = landmarks.lower_bound_to(flat.index(end))
+        def heuristic(x, y):
+            return max(distance(x, y), min_cost * landmark_bound(x * ROW + y))
     
-    # Dictionaries to store path and cost
-    came_from = {}  # Store path
-    g_score = {start: 0}  # Cost from start to each node (g(n)), g(n) is Manhattan distance from start point
+    # Per-node state lives in flat arrays indexed by col * ROW + row,
+    # allocated once up front instead of growing dictionaries of tuples
+    INF = float("inf")
+    g_score = _node_state(len(flat), INF)  # Cost from start to each node (g(n))
+    came_from = _node_state(len(flat), -1)  # Parent index of each node
+    closed_set = _node_state(len(flat), 0)  # 1 for nodes already expanded
+
+    start_index = flat.index(start)
+    end_index = flat.index(end)
+    g_score[start_index] = 0
     
-    closed_set = set()  # Set to store visited nodes
+    # The open set is a binary heap of tuples (f(n), h(n), g(n), index).
+    # Ties on f(n) are broken towards the lowest h(n) (the node closest to
+    # the goal), then by index, so the search order is deterministic.
+    # Nodes are never removed from the heap when their cost improves, a new
+    # entry is pushed instead and the old one is skipped when it is popped.
+    start_h = heuristic(*start)
+    open_set = [(start_h, start_h, 0, start_index)]
+
+    # Search counters
+    expanded = 0  # Nodes taken off the open set and expanded
+    pushed = 1  # Entries pushed onto the open set
+    stale = 0  # Outdated heap entries that were skipped
+    reopened = 0  # Closed nodes that were put back on the open set
+    max_open = 1  # Largest size of the open set
+
+    def finish(phase_began, phase):
+        # Copy the counters into the stats object, if one was passed
+        if stats is not None:
+            stats.expanded = expanded
+            stats.pushed = pushed
+            stats.stale = stale
+            stats.reopened = reopened
+            stats.max_open = max_open
+            stats.times[phase] = time.perf_counter() - phase_began
+
+    if stats is not None:
+        stats.times["setup"] = time.perf_counter() - began
+    began = time.perf_counter()
 
     while open_set:
-        open_set.sort()  # Sort open_set to find the node with the lowest f(n)
-        _, current = open_set.pop(0)  # Get node with lowest f(n)
+        current_f, _, current_g, current = heapq.heappop(open_set)  # Get node with lowest f(n)
+
+        # Skip entries for nodes that were already expanded or that have
+        # since been reached with a lower cost (lazy deletion)
+        if closed_set[current] or current_g > g_score[current]:
+            stale += 1
+            continue
 
         # Add the node to the closed set to avoid re-processing
-        closed_set.add(current)
+        closed_set[current] = 1
+        expanded += 1
+        if expanded % STOP_CHECK_INTERVAL == 0:
+            if progress is not None:
+                progress(expanded, current_f)
+            if should_stop is not None and should_stop():
+                finish(began, "search")
+                raise SearchCancelled("Search stopped after {} expansions".format(expanded))
+        if on_expand is not None:
+            on_expand(flat.cell(current), current_g, current_f)
+
+        if current == end_index:
+            finish(began, "search")
+            began = time.perf_counter()
 
-        if current == end:
             # Reconstruct path
             path = []
-            while current in came_from:
-                path.append(current)
+            while current != start_index:
+                path.append(flat.cell(current))
                 current = came_from[current]
             path.append(start)
             path.reverse()
+            finish(began, "path")
 
-            display_message("Path found! Path: " + str(path))
-            display_message("End location is " + str(end))
-            display_message("Start location is " + str(start))
+            log("Path found! Path: {}", path)
+            log("End location is {}", end)
+            log("Start location is {}", start)
+            log(
+                "Expanded {} nodes ({} pushed, {} stale entries skipped, {} reopened)",
+                expanded, pushed, stale, reopened,
+            )
             return path  # Send the path back to the GUI to be displayed
         
-        for move in moves:
-            neighbor = (current[0] + move[0], current[1] + move[1])  # Possible move
+        x, y = divmod(current, ROW)
+
+        for dx, dy, offset, step in moves:
+            nx = x + dx
+            ny = y + dy
             
             # Check bounds and obstacles
-            if not (0 <= neighbor[0] < COL and 0 <= neighbor[1] < ROW):
-                continue
-            if grid[neighbor[0]][neighbor[1]] == 0:  # 0 means obstacle
+            if not (0 <= nx < COL and 0 <= ny < ROW):
                 continue
-            if neighbor in closed_set:  # Skip already processed nodes
+            neighbor = current + offset
+            cost = cells[neighbor]
+            if cost == 0:  # 0 means obstacle
                 continue
-
-            new_g_score = g_score[current] + 1  # Update g(n)
+            if dx != 0 and dy != 0 and (
+                cells[current + dx * ROW] == 0 or cells[current + dy] == 0
+            ):
+                continue  # Diagonal steps may not cut the corner of an obstacle
             
             
             ####################################################################
             # Core A* Algorithm:
-            # g(n) is Manhattan distance from the start point to the current point
-            # h(n) is Euclidean distance from the current point to the end point
+            # g(n) is the cost of the path from the start point to the current point
+            # h(n) is the Manhattan or octile distance to the end point
             # f(n) = g(n) + h(n) is the estimated total cost
             ####################################################################
 
-            if neighbor not in g_score or new_g_score < g_score[neighbor]:
+            new_g_score = current_g + step * cost  # Update g(n)
+            if new_g_score < g_score[neighbor]:
+                if closed_set[neighbor]:
+                    if g_score[neighbor] - new_g_score < 1e-9:
+                        continue  # Rounding error in sums of diagonal steps
+                    # A cheaper route to an expanded node was found, which
+                    # can only happen with an inconsistent heuristic
+                    closed_set[neighbor] = 0
+                    reopened += 1
                 g_score[neighbor] = new_g_score
-                f_score = new_g_score + heuristic(neighbor, end)
-                open_set.append((f_score, neighbor))
+                h_score = heuristic(nx, ny)
+                f_score = new_g_score + h_score
+                heapq.heappush(open_set, (f_score, h_score, new_g_score, neighbor))
+                pushed += 1
                 came_from[neighbor] = current
+
+        if len(open_set) > max_open:
+            max_open = len(open_set)
     
-    display_message("No path found")
+    finish(began, "search")
+    log("No path found")
+    log(
+        "Expanded {} nodes ({} pushed, {} stale entries skipped, {} reopened)",
+        expanded, pushed, stale, reopened,
+    )
     return []  # No path found
 
+# Grids with more cells than this keep the per-node state of a search in
+# dictionaries of the cells it reaches, instead of arrays over every cell
+# (about 13 bytes per cell), so a short search on a huge map stays small
+SPARSE_STATE_CELLS = 1 << 22
+
+
+class _SparseState(dict):
+    # Dictionary that reads as default for every index never written,
+    # standing in for a per-node array
+    __slots__ = ("default",)
+
+    def __init__(self, default):
+        dict.__init__(self)
+        self.default = default
+
+    def __missing__(self, index):
+        return self.default
+
+
+def _node_state(size, default):
+    # Per-node search state for a grid of size cells, every entry starting
+    # at default: a float array for inf, a bytearray for 0 flags and an
+    # int array otherwise, or a _SparseState on very large grids
+    if size > SPARSE_STATE_CELLS:
+        return _SparseState(default)
+    if default == 0:
+        return bytearray(size)
+    return array("d" if isinstance(default, float) else "i", [default]) * size
+
+
+def _moves(rows, diagonal):
+    # Moves as (dcol, drow, index offset, step length) on a grid with this
+    # many rows. Straight steps have length 1, diagonal ones sqrt(2).
+    moves = [(0, 1, 1, 1), (0, -1, -1, 1), (1, 0, rows, 1), (-1, 0, -rows, 1)]
+    if diagonal:
+        SQRT2 = 2 ** 0.5
+        moves += [(dx, dy, dx * rows + dy, SQRT2) for dx in (1, -1) for dy in (1, -1)]
+    return moves
+
+
+def _distance_heuristic(end_x, end_y, diagonal, min_cost=1):
+    # Admissible and consistent distance to (end_x, end_y) for the move set:
+    # octile distance with diagonal moves, Manhattan distance without, both
+    # scaled by the cheapest cell cost
+    if diagonal:
+        straight = min_cost
+        saving = (2 - 2 ** 0.5) * min_cost  # Two straight steps less one diagonal
+        def heuristic(x, y):
+            dx = abs(x - end_x)
+            dy = abs(y - end_y)
+            return straight * (dx + dy) - saving * min(dx, dy)
+    elif min_cost == 1:
+        def heuristic(x, y):
+            return abs(x - end_x) + abs(y - end_y)
+    else:
+        def heuristic(x, y):
+            return min_cost * (abs(x - end_x) + abs(y - end_y))
+    return heuristic
+
+
+def _min_cost(cells, chunk_size=1 << 20):
+    # Cheapest walkable cell value, the lowest cost of any step. The cells
+    # are scanned a chunk at a time, so a large memory-mapped grid is never
+    # copied whole, and the scan ends at the first cell of cost 1.
+    view = memoryview(cells).cast("B") if not isinstance(cells, memoryview) else cells
+    best = 256
+    for position in range(0, len(view), chunk_size):
+        chunk = bytes(view[position:position + chunk_size])
+        for value in range(1, best):
+            if value in chunk:
+                best = value
+                break
+        if best == 1:
+            break
+    return best if best < 256 else 1
+
+
+def _has_costs(cells, chunk_size=1 << 20):
+    # True if a walkable cell has a value above 1. Like _min_cost it scans
+    # a chunk at a time, dropping the 0s and 1s of each chunk.
+    view = memoryview(cells).cast("B") if not isinstance(cells, memoryview) else cells
+    for position in range(0, len(view), chunk_size):
+        if bytes(view[position:position + chunk_size]).translate(None, b"\x00\x01"):
+            return True
+    return False
+
+
+def _grid_min_cost(grid, flat):
+    # Cheapest walkable cell value of the grid a search was given. Grids
+    # that keep a min_cost (FlatGrid, OccupancyGrid) are only scanned the
+    # first time, after that the value is read back.
+    min_cost = getattr(grid, "min_cost", None)
+    if min_cost is None:
+        min_cost = flat.min_cost
+    if min_cost is None:
+        min_cost = _min_cost(flat.cells)
+        if isinstance(grid, FlatGrid):
+            grid.min_cost = min_cost
+    return min_cost
+
+
+def path_cost(grid, path):
+
+    """
+    Return the cost of a path of neighbouring cells on a cost grid.
+
+    Each step costs the value of the cell it enters, times sqrt(2) for a
+    diagonal step, as in a_star_search.
+
+    Args:
+        grid (list of list or numpy.ndarray): Grid as accepted by do_a_star.
+        path (list): Path as a list of (col, row).
+
+    Returns:
+        float: The cost, 0 for a path of fewer than two cells.
+
+    """
+
+    flat = FlatGrid(grid)
+    cost = 0
+    for a, b in zip(path, path[1:]):
+        step = 2 ** 0.5 if a[0] != b[0] and a[1] != b[1] else 1
+        cost += step * flat.cells[flat.index(b)]
+    return cost
+
+
+# Default search mode of plan(), and the engine the GUI selects at start.
+# "astar" runs do_a_star, "jps" runs do_jump_point_search, "anytime" runs
+# do_anytime_search, "bidir" runs do_bidirectional_search, "theta" runs
+# do_theta_star, "dstar" runs an IncrementalPlanner, "hpa" runs a
+# HierarchicalPlanner and "flow" runs a FlowFieldPlanner. Other engines can
+# be added with register_planner.
+PLANNER_MODE = "astar"
+
+# Settings of the "anytime" mode (ARA*) when it is run through plan().
+# The first path costs at most ANYTIME_INITIAL_WEIGHT times the optimum and
+# the search keeps improving it for up to ANYTIME_TIME_BUDGET seconds.
+ANYTIME_INITIAL_WEIGHT = 3.0
+ANYTIME_WEIGHT_STEP = 0.5
+ANYTIME_TIME_BUDGET = 0.5
+
+# The anytime search checks its time budget every this many expansions
+ANYTIME_CHECK_INTERVAL = 64
+
+# Allow diagonal moves in modes that support 8-connected movement
+DIAGONAL_MOVES = False
+
+# Straighten the paths of the grid-based modes with shortcut_path
+SHORTCUT_PATHS = False
+
+
+def plan(grid, start, end, display_message, mode=None, diagonal=None, should_stop=None,
+         landmarks=None, progress=None, stats=None, on_expand=None, time_budget=None):
+
+    """
+    Run the selected search mode on a grid.
+
+    Args:
+        grid (list of list or numpy.ndarray): Grid as accepted by do_a_star.
+        start (tuple): (col, row) start position.
+        end (tuple): (col, row) goal position.
+        display_message (function): Function to display messages in GUI.
+        mode (str): Name of a registered planner, defaults to PLANNER_MODE.
+        diagonal (bool): 8-connected movement, defaults to DIAGONAL_MOVES.
+        should_stop (function): Optional cancellation check, see
+            a_star_search. "anytime" returns its best path so far instead
+            of raising. Not supported by stateful engines (see
+            PlannerEngine.stateful).
+        landmarks (LandmarkTable): Optional ALT tables for "astar" mode.
+        progress (function): Optional progress report, see a_star_search.
+            Not supported by stateful engines.
+        stats (SearchStats): Optional stats object filled in by the search.
+        on_expand (function): Optional expansion callback, see
+            a_star_search. Not supported by "anytime", "bidir", "theta"
+            and stateful engines.
+        time_budget (float): Seconds "anytime" may spend improving its
+            path, defaults to ANYTIME_TIME_BUDGET. Its bound is reported
+            in stats. Ignored by the other built-in modes.
+
+    Returns:
+        list: Path from start to end as a list of (col, row), one entry
+              per cell. Returns an empty list if no path is found. With
+              "theta" or SHORTCUT_PATHS consecutive cells may touch only
+              at a corner, see densify_path.
+
+    """
+
+    engine = get_planner(PLANNER_MODE if mode is None else mode)
+    diagonal = DIAGONAL_MOVES if diagonal is None else diagonal
+    warn_ignored_costs(grid, engine.name, display_message)
+
+    if engine.stateful:
+        path = engine.create(grid).plan(start, end, display_message, stats)
+    else:
+        path = engine.search(
+            grid, start, end, display_message, diagonal, should_stop, landmarks,
+            progress, stats, on_expand, time_budget,
+        )
+
+    if SHORTCUT_PATHS and not engine.any_angle:
+        path = shortcut_path(grid, path, dense=True)
+    return path
+
+
+def create_planner(grid, mode):
+
+    """
+    Create the planner object of a stateful engine.
+
+    The object keeps its own copy of the grid. Change it with
+    set_cell(cell, value) and query it with
+    plan(start, end, display_message, stats).
+
+    Args:
+        grid (list of list or numpy.ndarray): Grid as accepted by do_a_star.
+        mode (str): Name of a stateful planner, such as "dstar", "hpa" or
+            "flow".
+
+    Returns:
+        IncrementalPlanner, HierarchicalPlanner or FlowFieldPlanner: The
+        planner.
+
+    """
+
+    engine = get_planner(mode)
+    if not engine.stateful:
+        raise ValueError("Planner mode {} keeps no state between queries".format(mode))
+    return engine.create(grid)
+
+
+def warn_ignored_costs(grid, mode, display_message):
+
+    """
+    Warn when a grid with cell costs is given to an engine that ignores them.
+
+    Engines registered with uniform_cost treat every walkable cell as cost
+    1, so on a grid with values above 1 their paths are the shortest in
+    steps, not the cheapest. The grid is only scanned when the warning
+    would be shown.
+
+    Args:
+        grid (list of list or numpy.ndarray): Grid as accepted by do_a_star,
+            or a stateful planner, which has the same cols, rows and cells.
+        mode (str): Name of a registered planner.
+        display_message (function): Function to display messages in GUI.
+
+    Returns:
+        bool: True if the warning was given.
+
+    """
+
+    log = MessageLog.wrap(display_message)
+    if not get_planner(mode).uniform_cost or not log.enabled("WARN"):
+        return False
+    if not _has_costs(FlatGrid(grid).cells):
+        return False
+    log("Planner mode {} ignores cell costs, every walkable cell costs 1", mode, type="WARN")
+    return True
+
+
+class PlannerEngine:
+
+    """
+    A search engine in the planner registry.
+
+    A plain engine is a function
+    search(grid, start, end, display_message, diagonal, should_stop,
+    landmarks, progress, stats, on_expand, time_budget) that returns a path
+    and ignores the arguments it does not support. A stateful engine, one
+    whose stateful property is True, is a factory create(grid) that
+    returns an object with plan(start, end, display_message, stats) and
+    set_cell(cell, value), which callers such as the GUI keep alive
+    between queries. Use planner_names(stateful=...) to list either kind.
+
+    Args:
+        name (str): Name the engine is selected by.
+        search (function): Search function of a plain engine.
+        create (function): Factory of a stateful engine.
+        description (str): Short description for menus and help texts.
+        any_angle (bool): The engine's paths are already any-angle, so
+            plan() never shortcuts them.
+        uniform_cost (bool): The engine treats every walkable cell as cost
+            1, so plan() warns when it is given a grid with cell costs (see
+            warn_ignored_costs).
+
+    """
+
+    def __init__(self, name, search=None, create=None, description="", any_angle=False,
+                 uniform_cost=False):
+        if (search is None) == (create is None):
+            raise ValueError("Planner {} needs either a search function or a factory".format(name))
+        self.name = name
+        self.search = search
+        self.create = create
+        self.description = description
+        self.any_angle = any_angle
+        self.uniform_cost = uniform_cost
+
+    @property
+    def stateful(self):
+        """True for a factory of planner objects that keep state between queries."""
+        return self.create is not None
+
+    def __repr__(self):
+        return "PlannerEngine({!r}, {})".format(self.name, "stateful" if self.stateful else "plain")
+
+
+# Registered engines by name, in registration order. The dictionary is kept
+# when this module is reloaded, so engines registered from other modules
+# survive a hot reload; the built-in ones are registered again at the end
+# of the file.
+try:
+    PLANNERS
+except NameError:
+    PLANNERS = {}
+
+
+def register_planner(name, search=None, create=None, description="", any_angle=False,
+                     uniform_cost=False):
+
+    """
+    Register a planner engine, replacing any engine of the same name.
+
+    Args:
+        name (str): Name the engine is selected by, for example in plan().
+        search (function): Search function of a plain engine, see
+            PlannerEngine.
+        create (function): Factory of a stateful engine, see PlannerEngine.
+        description (str): Short description for menus and help texts.
+        any_angle (bool): See PlannerEngine.
+        uniform_cost (bool): See PlannerEngine.
+
+    Returns:
+        PlannerEngine: The registered engine.
+
+    """
+
+    engine = PlannerEngine(name, search, create, description, any_angle, uniform_cost)
+    PLANNERS[name] = engine
+    return engine
+
+
+def get_planner(name):
+    """Return the registered engine of a name, raising ValueError if there is none."""
+    engine = PLANNERS.get(name)
+    if engine is None:
+        raise ValueError("Unknown planner mode: {}".format(name))
+    return engine
+
+
+def planner_names(stateful=None):
+
+    """
+    List the registered engines.
+
+    Args:
+        stateful (bool): Only list stateful (True) or plain (False)
+            engines. Lists every engine when None.
+
+    Returns:
+        list: Engine names in registration order.
+
+    """
+
+    return [
+        name for name, engine in PLANNERS.items()
+        if stateful is None or engine.stateful == stateful
+    ]
+
+
+# A wall followed by an open cell along a line of cells. A straight scan
+# beside that line has a forced neighbour at the open cell.
+_WALL_THEN_OPEN = re.compile(b"\\x00[^\\x00]")
+
+# Rows and columns a jump point search keeps copies of before it drops them
+JPS_LINE_CACHE = 4096
+
+# Cells a straight jump point scan steps through one by one before it
+# searches the rest of the line at once. On cluttered maps most scans end
+# within a few cells, where stepping is cheaper.
+JPS_STEP_CELLS = 8
+
+
+def do_jump_point_search(grid, start, end, display_message, diagonal=False, should_stop=None,
+                         progress=None, stats=None, on_expand=None):
+
+    """
+    Perform Jump Point Search on a uniform-cost grid.
+
+    JPS runs A* over a reduced set of "jump points". Straight (and, with
+    diagonal moves, diagonal) runs of open cells are scanned without being
+    put on the open set, and the scan only stops where a wall forces the
+    shortest path to turn. Every walkable cell costs the same to enter.
+
+    Args:
+        grid (list of list or numpy.ndarray): Grid as accepted by do_a_star.
+        start (tuple): (col, row) start position.
+        end (tuple): (col, row) goal position.
+        display_message (function): Function to display messages in GUI.
+        diagonal (bool): Allow 8-connected moves. Diagonal steps cost
+            sqrt(2) and may not cut the corner of an obstacle.
+        should_stop (function): Optional function polled every
+            STOP_CHECK_INTERVAL expansions, see a_star_search.
+        progress (function): Optional progress report, see a_star_search.
+        stats (SearchStats): Optional stats object, see a_star_search.
+            Expansions count jump points.
+        on_expand (function): Optional expansion callback, see
+            a_star_search. Called for jump points only.
+
+    Returns:
+        list: Shortest path from start to end as a list of (col, row), one
+              entry per cell. Returns an empty list if no path is found.
+
+    """
+
+    began = time.perf_counter()
+    log = MessageLog.wrap(display_message)
+    flat = FlatGrid(grid)
+    COL = flat.cols
+    ROW = flat.rows
+    cells = flat.cells
+    end_x, end_y = end
+    end_index = flat.index(end)
+    SQRT2 = 2 ** 0.5
+
+    def free(x, y):
+        return 0 <= x < COL and 0 <= y < ROW and cells[x * ROW + y] != 0
+
+    # Heuristic matching the movement model (octile or Manhattan distance)
+    if diagonal:
+        def heuristic(x, y):
+            dx = abs(x - end_x)
+            dy = abs(y - end_y)
+            return dx + dy + (SQRT2 - 2) * min(dx, dy)
+    else:
+        def heuristic(x, y):
+            return abs(x - end_x) + abs(y - end_y)
+
+    # Straight scans run over byte copies of whole rows and columns with
+    # find and a regular expression, so a scan costs a few calls however
+    # long it is. Backward scans use reversed copies.
+    lines = {}  # (is_row, row or column, backward) -> bytes
+
+    def line(is_row, number, backward):
+        key = (is_row, number, backward)
+        found = lines.get(key)
+        if found is None:
+            if len(lines) >= JPS_LINE_CACHE:
+                lines.clear()
+            if backward:
+                found = line(is_row, number, False)[::-1]
+            elif is_row:
+                found = bytes(cells[number::ROW])
+            else:
+                found = bytes(cells[number * ROW:(number + 1) * ROW])
+            lines[key] = found
+        return found
+
+    def scan(is_row, number, position, goal, backward):
+        # First jump point after position along a row or column: the goal
+        # or a cell with a forced neighbour, i.e. one where the line beside
+        # it opens up after a wall. Returns (position, True) for a jump
+        # point and (position of the wall or edge, False) if that comes
+        # first.
+        size = COL if is_row else ROW
+        if backward:
+            position = size - 1 - position
+            if goal is not None:
+                goal = size - 1 - goal
+        cells_on_line = line(is_row, number, backward)
+        limit = cells_on_line.find(b"\x00", position + 1)
+        if limit < 0:
+            limit = size
+        stop = limit
+        if goal is not None and position < goal < stop:
+            stop = goal
+        for side in (number - 1, number + 1):
+            if 0 <= side < (ROW if is_row else COL):
+                match = _WALL_THEN_OPEN.search(line(is_row, side, backward), position, stop)
+                if match is not None:
+                    stop = match.start() + 1
+        return (size - 1 - stop if backward else stop), stop != limit
+
+    def step_row(x, y, dx):
+        # Straight scan along a row, returning (column, True) at a jump
+        # point or (column of the wall or edge, False). The first cells are
+        # stepped through on the flat cells, the rest is left to scan.
+        index = x * ROW + y
+        step = dx * ROW
+        above = y + 1 < ROW
+        below = y > 0
+        for _ in range(JPS_STEP_CELLS):
+            x += dx
+            index += step
+            if not 0 <= x < COL or cells[index] == 0:
+                return x, False
+            # A wall behind an open cell beside the scan forces a turn here
+            if index == end_index or (
+                above and cells[index + 1] != 0 and cells[index + 1 - step] == 0
+            ) or (
+                below and cells[index - 1] != 0 and cells[index - 1 - step] == 0
+            ):
+                return x, True
+        return scan(True, y, x, end_x if y == end_y else None, dx < 0)
+
+    def step_column(x, y, dy):
+        # As step_row, along a column
+        index = x * ROW + y
+        right = x + 1 < COL
+        left = x > 0
+        for _ in range(JPS_STEP_CELLS):
+            y += dy
+            index += dy
+            if not 0 <= y < ROW or cells[index] == 0:
+                return y, False
+            if index == end_index or (
+                right and cells[index + ROW] != 0 and cells[index + ROW - dy] == 0
+            ) or (
+                left and cells[index - ROW] != 0 and cells[index - ROW - dy] == 0
+            ):
+                return y, True
+        return scan(False, x, y, end_y if x == end_x else None, dy < 0)
+
+    def jump_straight(x, y, dx, dy):
+        # Scan along a row (dx != 0) or a column (dy != 0) until a jump
+        # point is found. Returns None if the scan runs into a wall.
+        if dx != 0:
+            stop, found = step_row(x, y, dx)
+            return (stop, y) if found else None
+        stop, found = step_column(x, y, dy)
+        if not diagonal:
+            # Without diagonal moves, every cell of a vertical scan is also
+            # where the path could turn into a row, so look sideways. Each
+            # row scan costs a few calls however far it reaches.
+            for row in range(y + dy, stop, dy):
+                if step_row(x, row, 1)[1] or step_row(x, row, -1)[1]:
+                    return (x, row)
+        return (x, stop) if found else None
+
+    def jump_diagonal(x, y, dx, dy):
+        # Scan along a diagonal, stopping where either straight scan from
+        # the current cell finds a jump point
+        while True:
+            if not (free(x + dx, y) and free(x, y + dy)):
+                return None  # Would cut the corner of an obstacle
+            x += dx
+            y += dy
+            if not free(x, y):
+                return None
+            if x == end_x and y == end_y:
+                return (x, y)
+            if jump_straight(x, y, dx, 0) or jump_straight(x, y, 0, dy):
+                return (x, y)
+
+    def directions(x, y, px, py):
+        # Directions worth scanning from (x, y) when it was reached from
+        # (px, py). Moves back towards the parent are pruned.
+        if px is None:
+            if diagonal:
+                return [(1, 0), (-1, 0), (0, 1), (0, -1),
+                        (1, 1), (1, -1), (-1, 1), (-1, -1)]
+            return [(1, 0), (-1, 0), (0, 1), (0, -1)]
+
+        dx = (x > px) - (x < px)
+        dy = (y > py) - (y < py)
+        if dx != 0 and dy != 0:
+            return [(dx, 0), (0, dy), (dx, dy)]
+        if diagonal:
+            if dx != 0:
+                return [(dx, 0), (0, 1), (0, -1), (dx, 1), (dx, -1)]
+            return [(0, dy), (1, 0), (-1, 0), (1, dy), (-1, dy)]
+        if dx != 0:
+            # Reached along a row, only turn where a wall forces it
+            result = [(dx, 0)]
+            for side in (1, -1):
+                if free(x, y + side) and not free(x - dx, y + side):
+                    result.append((0, side))
+            return result
+        return [(0, dy), (1, 0), (-1, 0)]
+
+    INF = float("inf")
+    g_score = _node_state(len(flat), INF)
+    came_from = _node_state(len(flat), -1)
+    closed_set = _node_state(len(flat), 0)
+
+    start_index = flat.index(start)
+    g_score[start_index] = 0
+    start_h = heuristic(*start)
+    open_set = [(start_h, start_h, 0, start_index)]
+    expanded = 0
+    pushed = 1
+    stale = 0
+    max_open = 1
+
+    def finish(phase_began, phase):
+        if stats is not None:
+            stats.expanded = expanded
+            stats.pushed = pushed
+            stats.stale = stale
+            stats.max_open = max_open
+            stats.times[phase] = time.perf_counter() - phase_began
+
+    if stats is not None:
+        stats.times["setup"] = time.perf_counter() - began
+    began = time.perf_counter()
+
+    while open_set:
+        current_f, _, current_g, current = heapq.heappop(open_set)
+        if closed_set[current] or current_g > g_score[current]:
+            stale += 1
+            continue
+        closed_set[current] = 1
+        expanded += 1
+        if expanded % STOP_CHECK_INTERVAL == 0:
+            if progress is not None:
+                progress(expanded, current_f)
+            if should_stop is not None and should_stop():
+                finish(began, "search")
+                raise SearchCancelled("Search stopped after {} expansions".format(expanded))
+        if on_expand is not None:
+            on_expand(flat.cell(current), current_g, current_f)
+
+        if current == end_index:
+            finish(began, "search")
+            began = time.perf_counter()
+
+            # Reconstruct the jump points, then fill in the cells between
+            jump_points = []
+            while current != start_index:
+                jump_points.append(flat.cell(current))
+                current = came_from[current]
+            jump_points.append(start)
+            jump_points.reverse()
+
+            path = [start]
+            for x, y in jump_points[1:]:
+                px, py = path[-1]
+                dx = (x > px) - (x < px)
+                dy = (y > py) - (y < py)
+                while (px, py) != (x, y):
+                    px += dx
+                    py += dy
+                    path.append((px, py))
+            finish(began, "path")
+
+            log("Path found! Path: {}", path)
+            log("End location is {}", end)
+            log("Start location is {}", start)
+            log("Expanded {} jump points out of {} path cells", expanded, len(path))
+            return path
+
+        x, y = flat.cell(current)
+        if came_from[current] == -1:
+            px = py = None
+        else:
+            px, py = flat.cell(came_from[current])
+
+        for dx, dy in directions(x, y, px, py):
+            if dx != 0 and dy != 0:
+                jump_point = jump_diagonal(x, y, dx, dy)
+            else:
+                jump_point = jump_straight(x, y, dx, dy)
+            if jump_point is None:
+                continue
+
+            jx, jy = jump_point
+            neighbor = jx * ROW + jy
+            if closed_set[neighbor]:
+                continue
+
+            # Jump points lie on a straight or diagonal line from the node
+            steps_x = abs(jx - x)
+            steps_y = abs(jy - y)
+            if diagonal:
+                new_g_score = current_g + max(steps_x, steps_y) + (SQRT2 - 1) * min(steps_x, steps_y)
+            else:
+                new_g_score = current_g + steps_x + steps_y
+
+            if new_g_score < g_score[neighbor]:
+                g_score[neighbor] = new_g_score
+                h_score = heuristic(jx, jy)
+                heapq.heappush(
+                    open_set, (new_g_score + h_score, h_score, new_g_score, neighbor)
+                )
+                pushed += 1
+                came_from[neighbor] = current
+
+        if len(open_set) > max_open:
+            max_open = len(open_set)
+
+    finish(began, "search")
+    log("No path found")
+    log("Expanded {} jump points", expanded)
+    return []
+
+
+def do_anytime_search(grid, start, end, display_message, diagonal=False, time_budget=None,
+                      expansion_budget=None, initial_weight=None, weight_step=None,
+                      on_solution=None, should_stop=None, progress=None, stats=None):
+
+    """
+    Anytime Repairing A* (ARA*) with a time or expansion budget.
+
+    The first search inflates the heuristic by initial_weight, which finds
+    a path quickly that costs at most that many times the optimum. The
+    weight is then lowered by weight_step and the search continues from
+    where it left off: only nodes whose cost improved since they were
+    expanded are searched again. This repeats until the path is optimal
+    or the budget runs out, and the best path found so far is returned.
+    Cell values are costs, as in a_star_search.
+
+    Args:
+        grid (list of list or numpy.ndarray): Grid as accepted by do_a_star.
+        start (tuple): (col, row) start position.
+        end (tuple): (col, row) goal position.
+        display_message (function): Function to display messages in GUI.
+        diagonal (bool): Allow 8-connected moves. Diagonal steps cost
+            sqrt(2) times the cell value and may not cut the corner of an
+            obstacle.
+        time_budget (float): Seconds the search may take, or None.
+        expansion_budget (int): Node expansions the search may use, or None.
+        initial_weight (float): Heuristic weight of the first search,
+            defaults to ANYTIME_INITIAL_WEIGHT.
+        weight_step (float): Amount the weight is lowered after each
+            search, defaults to ANYTIME_WEIGHT_STEP.
+        on_solution (function): Optional function called with each new
+            path and its suboptimality bound as soon as it is found.
+        should_stop (function): Optional cancellation check, see
+            a_star_search. The best path so far is returned when it fires.
+        progress (function): Optional progress report, see a_star_search.
+        stats (SearchStats): Optional stats object, see a_star_search.
+            times holds the total "search" time and the time to the
+            "first path", and bound the bound returned.
+
+    Returns:
+        tuple: (path, bound). path is the best path found as a list of
+               (col, row), one entry per cell, or an empty list if none
+               was found in the budget. Its cost is at most bound times
+               the cost of the shortest path (bound is inf without a path
+               and 1.0 once the path is known to be optimal).
+
+    """
+
+    began = time.perf_counter()
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    weight = ANYTIME_INITIAL_WEIGHT if initial_weight is None else initial_weight
+    weight_step = ANYTIME_WEIGHT_STEP if weight_step is None else weight_step
+    log = MessageLog.wrap(display_message)
+
+    flat = FlatGrid(grid)
+    COL = flat.cols
+    ROW = flat.rows
+    cells = flat.cells
+    end_x, end_y = end
+
+    # Moves and a consistent heuristic for them, as in a_star_search
+    moves = _moves(ROW, diagonal)
+    heuristic = _distance_heuristic(end_x, end_y, diagonal, _grid_min_cost(grid, flat))
+
+    INF = float("inf")
+    g_score = _node_state(len(flat), INF)
+    came_from = _node_state(len(flat), -1)
+    closed_set = _node_state(len(flat), 0)  # Expanded in the current iteration
+
+    start_index = flat.index(start)
+    end_index = flat.index(end)
+    g_score[start_index] = 0
+
+    # OPEN holds nodes waiting to be expanded in this iteration. Nodes that
+    # improve after being expanded go to INCONS and are only searched again
+    # in the next iteration, which is what keeps each iteration cheap.
+    # Heap entries are (f(n), h(n), g(n), index) with f(n) = g(n) + weight * h(n)
+    open_nodes = {start_index}
+    incons = set()
+    start_h = heuristic(*start)
+    open_set = [(weight * start_h, start_h, 0, start_index)]
+
+    expanded = 0
+    pushed = 1
+    stale = 0
+    max_open = 1
+    best_path = []
+    best_cost = INF
+    best_bound = INF
+    out_of_budget = False
+
+    def extract_path():
+        path = []
+        current = end_index
+        while current != start_index:
+            path.append(flat.cell(current))
+            current = came_from[current]
+        path.append(start)
+        path.reverse()
+        return path
+
+    def lower_bound():
+        # No path can be cheaper than the lowest unweighted f(n) among the
+        # nodes that may still improve
+        best = INF
+        for index in open_nodes:
+            x, y = divmod(index, ROW)
+            best = min(best, g_score[index] + heuristic(x, y))
+        for index in incons:
+            x, y = divmod(index, ROW)
+            best = min(best, g_score[index] + heuristic(x, y))
+        return best
+
+    while True:
+        # Improve the path with the current weight
+        while open_set:
+            f_score, _, current_g, current = open_set[0]
+            if current not in open_nodes or current_g > g_score[current]:
+                heapq.heappop(open_set)
+                stale += 1
+                continue
+            if g_score[end_index] <= f_score:
+                break  # No node left in OPEN can improve the path
+
+            if (expansion_budget is not None and expanded >= expansion_budget) or (
+                expanded % ANYTIME_CHECK_INTERVAL == 0
+                and (
+                    (deadline is not None and time.monotonic() > deadline)
+                    or (should_stop is not None and should_stop())
+                )
+            ):
+                out_of_budget = True
+                break
+
+            heapq.heappop(open_set)
+            open_nodes.discard(current)
+            closed_set[current] = 1
+            expanded += 1
+            if progress is not None and expanded % STOP_CHECK_INTERVAL == 0:
+                progress(expanded, f_score)
+
+            x, y = divmod(current, ROW)
+            for dx, dy, offset, step in moves:
+                nx = x + dx
+                ny = y + dy
+                if not (0 <= nx < COL and 0 <= ny < ROW):
+                    continue
+                neighbor = current + offset
+                cost = cells[neighbor]
+                if cost == 0:
+                    continue
+                if dx != 0 and dy != 0 and (
+                    cells[current + dx * ROW] == 0 or cells[current + dy] == 0
+                ):
+                    continue  # Would cut the corner of an obstacle
+
+                new_g_score = current_g + step * cost
+                if closed_set[neighbor] and g_score[neighbor] - new_g_score < 1e-9:
+                    continue  # Rounding error in sums of diagonal steps
+                if new_g_score < g_score[neighbor]:
+                    g_score[neighbor] = new_g_score
+                    came_from[neighbor] = current
+                    if closed_set[neighbor]:
+                        incons.add(neighbor)
+                    else:
+                        open_nodes.add(neighbor)
+                        h_score = heuristic(nx, ny)
+                        heapq.heappush(
+                            open_set,
+                            (new_g_score + weight * h_score, h_score, new_g_score, neighbor),
+                        )
+                        pushed += 1
+            if len(open_set) > max_open:
+                max_open = len(open_set)
+
+        # Publish the path if it improved, with the tightest bound known
+        if g_score[end_index] < INF:
+            found_cost = g_score[end_index]
+            bound = found_cost / max(lower_bound(), 1e-12)
+            if not out_of_budget:
+                bound = min(bound, weight)
+            bound = max(bound, 1.0)
+            if found_cost < best_cost or bound < best_bound:
+                if not best_path and stats is not None:
+                    stats.times["first path"] = time.perf_counter() - began
+                best_path = extract_path()
+                best_cost = found_cost
+                best_bound = bound
+                if on_solution is not None:
+                    on_solution(best_path, best_bound)
+
+        if out_of_budget or best_bound <= 1.0 or not (open_nodes or incons):
+            break
+        if not best_path:
+            break  # The whole reachable area was searched without a path
+
+        # Next iteration: lower the weight, move INCONS into OPEN and
+        # reorder OPEN for the new weight
+        weight = max(1.0, min(weight - weight_step, best_bound))
+        open_nodes |= incons
+        incons = set()
+        open_set = []
+        for index in open_nodes:
+            h_score = heuristic(*divmod(index, ROW))
+            open_set.append((g_score[index] + weight * h_score, h_score, g_score[index], index))
+        heapq.heapify(open_set)
+        pushed += len(open_set)
+        closed_set = _node_state(len(flat), 0)
+
+    if stats is not None:
+        stats.expanded = expanded
+        stats.pushed = pushed
+        stats.stale = stale
+        stats.max_open = max_open
+        stats.times["search"] = time.perf_counter() - began
+        stats.bound = best_bound
+
+    if best_path:
+        log("Path found! Path: {}", best_path)
+        log("Path costs at most {:.3f} times the optimum", best_bound)
+    else:
+        log("No path found")
+    log("Expanded {} nodes{}", expanded, " (budget used up)" if out_of_budget else "")
+    return best_path, best_bound
+
+
+def do_bidirectional_search(grid, start, end, display_message, diagonal=False, should_stop=None,
+                            progress=None, stats=None):
+
+    """
+    Bidirectional A*: one search forward from the start, one backward from
+    the end.
+
+    Each step expands the side with the smaller open set. Whenever one
+    side reaches a node the other side has a cost for, the two halves
+    form a path, and the cheapest such path is kept. No cheaper path can
+    be left once the lowest f(n) on either side is at least its cost,
+    which is when the search stops. Costs, moves and heuristics are the
+    same as in a_star_search, so the paths cost the same and the
+    expansion counts (both sides added together) can be compared
+    directly.
+
+    Args:
+        grid (list of list or numpy.ndarray): Grid as accepted by do_a_star.
+        start (tuple): (col, row) start position.
+        end (tuple): (col, row) goal position.
+        display_message (function): Function to display messages in GUI.
+        diagonal (bool): Allow 8-connected moves, see a_star_search.
+        should_stop (function): Optional cancellation check, see
+            a_star_search.
+        progress (function): Optional progress report, see a_star_search.
+        stats (SearchStats): Optional stats object, see a_star_search.
+            The counters add up both sides.
+
+    Returns:
+        list: Cheapest path from start to end as a list of (col, row).
+              Returns an empty list if no path is found.
+
+    """
+
+    began = time.perf_counter()
+    log = MessageLog.wrap(display_message)
+    flat = FlatGrid(grid)
+    COL = flat.cols
+    ROW = flat.rows
+    cells = flat.cells
+    moves = _moves(ROW, diagonal)
+    min_cost = _grid_min_cost(grid, flat)
+    INF = float("inf")
+
+    start_index = flat.index(start)
+    end_index = flat.index(end)
+
+    # Everything per side: [g scores, parents, closed set, heap, heuristic,
+    # expansions]. Side 0 searches forward from the start towards the end,
+    # side 1 backward from the end towards the start.
+    sides = []
+    for source, target in ((start, end), (end, start)):
+        heuristic = _distance_heuristic(target[0], target[1], diagonal, min_cost)
+        g_score = _node_state(len(flat), INF)
+        g_score[flat.index(source)] = 0
+        source_h = heuristic(*source)
+        sides.append([
+            g_score,
+            _node_state(len(flat), -1),
+            _node_state(len(flat), 0),
+            [(source_h, source_h, 0, flat.index(source))],
+            heuristic,
+            0,
+        ])
+
+    best_cost = INF  # Cost of the cheapest path found so far (mu)
+    meeting = start_index if start_index == end_index else -1
+    if meeting >= 0:
+        best_cost = 0
+    pushed = 2
+    stale = 0
+    max_open = 2
+
+    def top(side):
+        # Drop outdated entries and return the lowest f(n) of a side
+        g_score, _, closed_set, open_set = side[0], side[1], side[2], side[3]
+        nonlocal stale
+        while open_set:
+            _, _, entry_g, index = open_set[0]
+            if closed_set[index] or entry_g > g_score[index]:
+                heapq.heappop(open_set)
+                stale += 1
+                continue
+            return open_set[0][0]
+        return INF
+
+    while True:
+        forward_top = top(sides[0])
+        backward_top = top(sides[1])
+        if max(forward_top, backward_top) >= best_cost:
+            break  # Covers an exhausted side too, its top is inf
+
+        # Expand the side with fewer open entries
+        direction = 0 if len(sides[0][3]) <= len(sides[1][3]) else 1
+        side = sides[direction]
+        other_g = sides[1 - direction][0]
+        g_score, came_from, closed_set, open_set, heuristic = side[:5]
+
+        current_f, _, current_g, current = heapq.heappop(open_set)
+        closed_set[current] = 1
+        side[5] += 1
+        expanded = sides[0][5] + sides[1][5]
+        if expanded % STOP_CHECK_INTERVAL == 0:
+            if progress is not None:
+                progress(expanded, min(forward_top, backward_top))
+            if should_stop is not None and should_stop():
+                raise SearchCancelled("Search stopped after {} expansions".format(expanded))
+
+        x, y = divmod(current, ROW)
+        for dx, dy, offset, step in moves:
+            nx = x + dx
+            ny = y + dy
+            if not (0 <= nx < COL and 0 <= ny < ROW):
+                continue
+            neighbor = current + offset
+            if cells[neighbor] == 0:
+                continue
+            if dx != 0 and dy != 0 and (
+                cells[current + dx * ROW] == 0 or cells[current + dy] == 0
+            ):
+                continue  # Diagonal steps may not cut the corner of an obstacle
+
+            # A forward step pays for the cell it enters; the backward side
+            # walks the same steps in reverse, entering the current cell
+            if direction == 0:
+                new_g_score = current_g + step * cells[neighbor]
+            else:
+                new_g_score = current_g + step * cells[current]
+            if closed_set[neighbor] or new_g_score >= g_score[neighbor]:
+                continue
+            g_score[neighbor] = new_g_score
+            came_from[neighbor] = current
+            h_score = heuristic(nx, ny)
+            heapq.heappush(open_set, (new_g_score + h_score, h_score, new_g_score, neighbor))
+            pushed += 1
+
+            # Reached by both sides: the halves join into a path
+            total = new_g_score + other_g[neighbor]
+            if total < best_cost:
+                best_cost = total
+                meeting = neighbor
+        if len(open_set) > max_open:
+            max_open = len(open_set)
+
+    forward_expanded = sides[0][5]
+    backward_expanded = sides[1][5]
+    expanded = forward_expanded + backward_expanded
+    if stats is not None:
+        stats.expanded = expanded
+        stats.pushed = pushed
+        stats.stale = stale
+        stats.max_open = max_open
+        stats.times["search"] = time.perf_counter() - began
+
+    if meeting < 0:
+        log("No path found")
+        log("Expanded {} nodes ({} forward, {} backward)", expanded, forward_expanded,
+            backward_expanded)
+        return []
+
+    # Forward parents lead from the meeting cell back to the start, the
+    # backward ones from it on to the end
+    path = []
+    current = meeting
+    while current != -1:
+        path.append(flat.cell(current))
+        current = sides[0][1][current]
+    path.reverse()
+    current = sides[1][1][meeting]
+    while current != -1:
+        path.append(flat.cell(current))
+        current = sides[1][1][current]
+
+    log("Path found! Path: {}", path)
+    log("End location is {}", end)
+    log("Start location is {}", start)
+    log("Expanded {} nodes ({} forward, {} backward)", expanded, forward_expanded,
+        backward_expanded)
+    return path
+
+
+def supercover_cells(a, b):
+
+    """
+    Return every cell the straight line between two cell centres touches.
+
+    The cells are listed in order from a to b. Consecutive cells share a
+    side, except where the line passes exactly through a corner: there the
+    line steps diagonally and the two cells beside the corner are not
+    listed (see line_of_sight, which requires both of them to be free).
+
+    Args:
+        a (tuple): (col, row) of the first cell.
+        b (tuple): (col, row) of the last cell.
+
+    Returns:
+        list: List of (col, row).
+
+    """
+
+    x, y = a
+    dx = b[0] - x
+    dy = b[1] - y
+    nx = abs(dx)
+    ny = abs(dy)
+    sx = (dx > 0) - (dx < 0)
+    sy = (dy > 0) - (dy < 0)
+
+    cells = [(x, y)]
+    ix = iy = 0
+    while ix < nx or iy < ny:
+        # Compare where the line crosses the next column and the next row
+        # border: (0.5 + ix) / nx against (0.5 + iy) / ny, in integers
+        decision = (1 + 2 * ix) * ny - (1 + 2 * iy) * nx
+        if decision == 0:
+            x += sx
+            y += sy
+            ix += 1
+            iy += 1
+        elif decision < 0:
+            x += sx
+            ix += 1
+        else:
+            y += sy
+            iy += 1
+        cells.append((x, y))
+    return cells
+
+
+def _line_of_sight(cells, rows, x, y, x1, y1):
+    # Walk the supercover of the line from (x, y) to (x1, y1) on the flat
+    # cells without building a list. Passing exactly through a corner needs
+    # both cells beside the corner free, as a diagonal move does.
+    dx = x1 - x
+    dy = y1 - y
+    nx = abs(dx)
+    ny = abs(dy)
+    sx = (dx > 0) - (dx < 0)
+    sy = (dy > 0) - (dy < 0)
+    ix = iy = 0
+    while ix < nx or iy < ny:
+        decision = (1 + 2 * ix) * ny - (1 + 2 * iy) * nx
+        if decision == 0:
+            if cells[(x + sx) * rows + y] == 0 or cells[x * rows + y + sy] == 0:
+                return False
+            x += sx
+            y += sy
+            ix += 1
+            iy += 1
+        elif decision < 0:
+            x += sx
+            ix += 1
+        else:
+            y += sy
+            iy += 1
+        if cells[x * rows + y] == 0:
+            return False
+    return True
+
+
+def line_of_sight(grid, a, b):
+
+    """
+    Return True if the straight line between two cell centres is free.
+
+    Every cell the line touches has to be walkable (see supercover_cells).
+
+    Args:
+        grid (list of list or numpy.ndarray): Grid as accepted by do_a_star.
+        a (tuple): (col, row) of the first cell.
+        b (tuple): (col, row) of the last cell.
+
+    Returns:
+        bool: True if nothing blocks the line.
+
+    """
+
+    flat = FlatGrid(grid)
+    if not (flat.is_free(a) and flat.is_free(b)):
+        return False
+    return _line_of_sight(flat.cells, flat.rows, a[0], a[1], b[0], b[1])
+
+
+def densify_path(waypoints):
+
+    """
+    Expand a waypoint list into the cells along its straight segments.
+
+    Args:
+        waypoints (list): List of (col, row) waypoints.
+
+    Returns:
+        list: List of (col, row) with every cell the segments touch, in
+              order and without repeating the waypoints.
+
+    """
+
+    if not waypoints:
+        return []
+    path = [tuple(waypoints[0])]
+    for a, b in zip(waypoints, waypoints[1:]):
+        path.extend(supercover_cells(a, b)[1:])
+    return path
+
+
+def shortcut_path(grid, path, dense=False):
+
+    """
+    Shorten a path by replacing runs of cells with straight lines.
+
+    Walking along the path, each waypoint is joined to the furthest later
+    cell it can still see, so the staircases of 4- and 8-connected paths
+    become straight segments.
+
+    Args:
+        grid (list of list or numpy.ndarray): Grid as accepted by do_a_star.
+        path (list): Path as a list of (col, row), for example from do_a_star.
+        dense (bool): Return every cell along the segments instead of
+            only the waypoints.
+
+    Returns:
+        list: The waypoints (or cells) of the shortened path.
+
+    """
+
+    if len(path) < 3:
+        return list(path)
+    flat = FlatGrid(grid)
+    cells = flat.cells
+    rows = flat.rows
+
+    waypoints = [path[0]]
+    anchor = path[0]
+    for i in range(2, len(path)):
+        x, y = path[i]
+        if not _line_of_sight(cells, rows, anchor[0], anchor[1], x, y):
+            # path[i - 1] is the furthest cell still visible from the anchor
+            anchor = path[i - 1]
+            waypoints.append(anchor)
+    waypoints.append(path[-1])
+    return densify_path(waypoints) if dense else waypoints
+
+
+def path_length(path):
+    """Return the Euclidean length of a path of waypoints or cells."""
+    return sum(
+        ((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2) ** 0.5 for a, b in zip(path, path[1:])
+    )
+
+
+def do_theta_star(grid, start, end, display_message, dense=False, should_stop=None,
+                  progress=None, stats=None):
+
+    """
+    Any-angle path planning with Theta*.
+
+    Theta* is A* on the 8-connected grid, except that a node reached from
+    a cell that its parent can see is linked straight to that parent. The
+    path is therefore a list of waypoints joined by straight lines, which
+    can run at any angle, instead of a staircase of grid moves. Every
+    walkable cell costs the same to cross.
+
+    Args:
+        grid (list of list or numpy.ndarray): Grid as accepted by do_a_star.
+        start (tuple): (col, row) start position.
+        end (tuple): (col, row) goal position.
+        display_message (function): Function to display messages in GUI.
+        dense (bool): Return every cell along the segments (see
+            densify_path) instead of only the waypoints.
+        should_stop (function): Optional cancellation check, see
+            a_star_search.
+        progress (function): Optional progress report, see a_star_search.
+        stats (SearchStats): Optional stats object, see a_star_search.
+
+    Returns:
+        list: Waypoints from start to end as a list of (col, row), or the
+              cells along them if dense is True. Returns an empty list if
+              no path is found.
+
+    """
+
+    began = time.perf_counter()
+    log = MessageLog.wrap(display_message)
+    flat = FlatGrid(grid)
+    COL = flat.cols
+    ROW = flat.rows
+    cells = flat.cells
+    end_x, end_y = end
+
+    # 8-connected moves as (dcol, drow, index offset, cost)
+    moves = _moves(ROW, True)
+
+    def heuristic(x, y):
+        return ((x - end_x) ** 2 + (y - end_y) ** 2) ** 0.5
+
+    INF = float("inf")
+    g_score = _node_state(len(flat), INF)
+    came_from = _node_state(len(flat), -1)
+    closed_set = _node_state(len(flat), 0)
+
+    start_index = flat.index(start)
+    end_index = flat.index(end)
+    g_score[start_index] = 0
+    came_from[start_index] = start_index
+    start_h = heuristic(*start)
+    open_set = [(start_h, start_h, 0, start_index)]
+    expanded = 0
+    pushed = 1
+    stale = 0
+    max_open = 1
+
+    def finish():
+        if stats is not None:
+            stats.expanded = expanded
+            stats.pushed = pushed
+            stats.stale = stale
+            stats.max_open = max_open
+            stats.times["search"] = time.perf_counter() - began
+
+    while open_set:
+        current_f, _, current_g, current = heapq.heappop(open_set)
+        if closed_set[current] or current_g > g_score[current]:
+            stale += 1
+            continue
+        closed_set[current] = 1
+        expanded += 1
+        if expanded % STOP_CHECK_INTERVAL == 0:
+            if progress is not None:
+                progress(expanded, current_f)
+            if should_stop is not None and should_stop():
+                finish()
+                raise SearchCancelled("Search stopped after {} expansions".format(expanded))
+
+        if current == end_index:
+            finish()
+            waypoints = []
+            while current != start_index:
+                waypoints.append(flat.cell(current))
+                current = came_from[current]
+            waypoints.append(start)
+            waypoints.reverse()
+            path = densify_path(waypoints) if dense else waypoints
+
+            log("Path found! Path: {}", path)
+            log("End location is {}", end)
+            log("Start location is {}", start)
+            log(
+                "Expanded {} nodes, {} waypoints, length {:.2f}",
+                expanded, len(waypoints), g_score[end_index],
+            )
+            return path
+
+        x, y = divmod(current, ROW)
+        parent = came_from[current]
+        px, py = divmod(parent, ROW)
+        parent_g = g_score[parent]
+        for dx, dy, offset, cost in moves:
+            nx = x + dx
+            ny = y + dy
+            if not (0 <= nx < COL and 0 <= ny < ROW):
+                continue
+            neighbor = current + offset
+            if cells[neighbor] == 0 or closed_set[neighbor]:
+                continue
+            if dx != 0 and dy != 0 and (
+                cells[current + dx * ROW] == 0 or cells[current + dy] == 0
+            ):
+                continue  # Would cut the corner of an obstacle
+
+            # Path 2: straight from the parent if it can see the neighbour,
+            # otherwise path 1: through the current node as in A*
+            if parent != current and _line_of_sight(cells, ROW, px, py, nx, ny):
+                source = parent
+                new_g_score = parent_g + ((nx - px) ** 2 + (ny - py) ** 2) ** 0.5
+            else:
+                source = current
+                new_g_score = current_g + cost
+
+            if new_g_score < g_score[neighbor]:
+                g_score[neighbor] = new_g_score
+                came_from[neighbor] = source
+                h_score = heuristic(nx, ny)
+                heapq.heappush(
+                    open_set, (new_g_score + h_score, h_score, new_g_score, neighbor)
+                )
+                pushed += 1
+        if len(open_set) > max_open:
+            max_open = len(open_set)
+
+    finish()
+    log("No path found")
+    log("Expanded {} nodes", expanded)
+    return []
+
+
+class IncrementalPlanner:
+
+    """
+    D* Lite planner that keeps its search between calls.
+
+    The search runs backwards from the goal, so when cells change or the
+    start moves only the part of the search affected by the change is
+    repaired, instead of planning again from scratch. Moves are
+    4-connected and every walkable cell costs 1 to enter, whatever its
+    value, so unlike do_a_star the path is the shortest in steps and cell
+    costs are ignored.
+
+    Args:
+        grid (list of list or numpy.ndarray): Grid as accepted by do_a_star.
+            The planner keeps its own copy, use set_cell to change it.
+
+    """
+
+    def __init__(self, grid):
+        flat = FlatGrid(grid)
+        self.cols = flat.cols
+        self.rows = flat.rows
+        self.cells = bytearray(flat.cells)
+        self.start = None
+        self.end = None
+        self.expanded = 0  # Nodes expanded by the last call to plan
+        self._changed = []  # Cells changed since the last call to plan
+
+    def set_cell(self, cell, value):
+
+        """
+        Change one cell of the grid.
+
+        Args:
+            cell (tuple): (col, row) of the cell.
+            value (int): New cell value, 0 for an obstacle, 1 for walkable.
+
+        """
+
+        index = cell[0] * self.rows + cell[1]
+        if self.cells[index] != value:
+            self.cells[index] = value
+            self._changed.append(index)
+
+    def plan(self, start, end, display_message=None, stats=None):
+
+        """
+        Return the shortest path from start to end on the current grid.
+
+        The first call, and any call with a new end, runs a full search.
+        Later calls only repair the previous search.
+
+        Args:
+            start (tuple): (col, row) start position.
+            end (tuple): (col, row) goal position.
+            display_message (function): Optional function to display
+                messages in GUI.
+            stats (SearchStats): Optional stats object. Only the expansion
+                count and the "repair", "search" and "path" times are
+                filled in.
+
+        Returns:
+            list: Shortest path from start to end as a list of (col, row).
+                  Returns an empty list if no path is found.
+
+        """
+
+        began = time.perf_counter()
+        if end != self.end:
+            self._initialize(start, end)
+        else:
+            if start != self.start:
+                # The start moved: raise all new keys by the distance moved
+                # so the keys already in the queue stay valid lower bounds
+                self._km += self._heuristic(self._start_index, self._index(start))
+                self.start = start
+                self._start_index = self._index(start)
+            for index in self._changed:
+                self._update_rhs(index)
+                for neighbor in _neighbors(index, self.cols, self.rows):
+                    self._update_rhs(neighbor)
+        self._changed = []
+        repaired = time.perf_counter()
+
+        self.expanded = 0
+        self._compute_shortest_path()
+        searched = time.perf_counter()
+        path = self._extract_path()
+
+        if stats is not None:
+            stats.expanded = self.expanded
+            stats.times["repair"] = repaired - began
+            stats.times["search"] = searched - repaired
+            stats.times["path"] = time.perf_counter() - searched
+
+        log = MessageLog.wrap(display_message)
+        if path:
+            log("Path found! Path: {}", path)
+        else:
+            log("No path found")
+        log("Expanded {} nodes", self.expanded)
+        return path
+
+    def _index(self, cell):
+        return cell[0] * self.rows + cell[1]
+
+    def _heuristic(self, a, b):
+        # Manhattan distance between two flat indices
+        ax, ay = divmod(a, self.rows)
+        bx, by = divmod(b, self.rows)
+        return abs(ax - bx) + abs(ay - by)
+
+    def _cost(self, a, b):
+        # Cost of moving between two neighbouring cells
+        if self.cells[a] == 0 or self.cells[b] == 0:
+            return float("inf")
+        return 1
+
+    def _initialize(self, start, end):
+        INF = float("inf")
+        size = self.cols * self.rows
+        self.start = start
+        self.end = end
+        self._start_index = self._index(start)
+        self._end_index = self._index(end)
+        self._km = 0
+        self._g = array("d", [INF]) * size
+        self._rhs = array("d", [INF]) * size
+        # Priority queue with lazy deletion. A heap entry is only current
+        # if the node is still queued and its key matches _key1/_key2.
+        self._queued = bytearray(size)
+        self._key1 = array("d", [INF]) * size
+        self._key2 = array("d", [INF]) * size
+        self._queue = []
+        self._rhs[self._end_index] = 0
+        self._push(self._end_index)
+
+    def _calculate_key(self, index):
+        best = min(self._g[index], self._rhs[index])
+        return (best + self._heuristic(self._start_index, index) + self._km, best)
+
+    def _push(self, index):
+        key = self._calculate_key(index)
+        self._queued[index] = 1
+        self._key1[index], self._key2[index] = key
+        heapq.heappush(self._queue, (key[0], key[1], index))
+
+    def _top(self):
+        # Drop outdated heap entries and return the current top entry
+        queue = self._queue
+        while queue:
+            k1, k2, index = queue[0]
+            if (
+                self._queued[index]
+                and k1 == self._key1[index]
+                and k2 == self._key2[index]
+            ):
+                return queue[0]
+            heapq.heappop(queue)
+        return None
+
+    def _update_vertex(self, index):
+        if self._g[index] != self._rhs[index]:
+            self._push(index)
+        else:
+            self._queued[index] = 0
+
+    def _update_rhs(self, index):
+        # Recompute rhs(u) = min over successors s of c(u, s) + g(s)
+        if index != self._end_index:
+            best = float("inf")
+            for neighbor in _neighbors(index, self.cols, self.rows):
+                cost = self._cost(index, neighbor) + self._g[neighbor]
+                if cost < best:
+                    best = cost
+            self._rhs[index] = best
+        self._update_vertex(index)
+
+    def _compute_shortest_path(self):
+        g = self._g
+        rhs = self._rhs
+        start = self._start_index
+        while True:
+            top = self._top()
+            if top is None:
+                break
+            start_key = self._calculate_key(start)
+            if (top[0], top[1]) >= start_key and rhs[start] <= g[start]:
+                break
+
+            k1, k2, index = top
+            new_key = self._calculate_key(index)
+            if (k1, k2) < new_key:
+                # The key was computed before km grew, requeue it
+                self._push(index)
+                continue
+
+            self.expanded += 1
+            if g[index] > rhs[index]:
+                # Overconsistent: the node got cheaper, settle it
+                g[index] = rhs[index]
+                self._queued[index] = 0
+                for neighbor in _neighbors(index, self.cols, self.rows):
+                    if neighbor != self._end_index:
+                        cost = self._cost(neighbor, index) + g[index]
+                        if cost < rhs[neighbor]:
+                            rhs[neighbor] = cost
+                    self._update_vertex(neighbor)
+            else:
+                # Underconsistent: the node got more expensive, so it and
+                # every node that relied on it have to be recomputed
+                g[index] = float("inf")
+                self._update_rhs(index)
+                for neighbor in _neighbors(index, self.cols, self.rows):
+                    self._update_rhs(neighbor)
+
+    def _extract_path(self):
+        # Follow the cheapest successor from the start down to the goal
+        current = self._start_index
+        if self._rhs[current] == float("inf") or self.cells[current] == 0:
+            return []
+        path = [self.start]
+        while current != self._end_index:
+            best = None
+            best_cost = float("inf")
+            for neighbor in _neighbors(current, self.cols, self.rows):
+                cost = self._cost(current, neighbor) + self._g[neighbor]
+                if cost < best_cost:
+                    best = neighbor
+                    best_cost = cost
+            if best is None or len(path) > len(self.cells):
+                return []
+            current = best
+            path.append(divmod(current, self.rows))
+        return path
+
+
+class HierarchicalPlanner:
+
+    """
+    Hierarchical path-finding (HPA*) over a precomputed cluster graph.
+
+    The grid is split into square clusters. Wherever two neighbouring
+    clusters share a run of open cells, one or two entrances are placed
+    on it, and the distances between the entrances of each cluster are
+    computed once. Queries search this small abstract graph and then
+    refine each abstract edge into cells with a search confined to one
+    cluster. Paths are near-optimal, not always the shortest. Moves are
+    4-connected and every walkable cell costs 1 to enter, whatever its
+    value, so cell costs are ignored.
+
+    Args:
+        grid (list of list or numpy.ndarray): Grid as accepted by do_a_star.
+            The planner keeps its own copy, use set_cell to change it.
+        cluster_size (int): Width and height of a cluster in cells.
+
+    """
+
+    # Border runs at least this long get an entrance at each end
+    LONG_ENTRANCE = 6
+
+    def __init__(self, grid, cluster_size=10):
+        flat = FlatGrid(grid)
+        self.cols = flat.cols
+        self.rows = flat.rows
+        self.cells = bytearray(flat.cells)
+        self.cluster_size = cluster_size
+        self.cluster_cols = -(-self.cols // cluster_size)
+        self.cluster_rows = -(-self.rows // cluster_size)
+        self.expanded = 0  # Abstract nodes expanded by the last query
+
+        self._borders = {}  # (cluster, cluster) -> [(index, index), ...]
+        self._nodes = {}  # cluster -> set of entrance indices
+        self._edges = {}  # entrance index -> {entrance index: cost}
+        self._dirty = set()  # Clusters with changed cells
+        self._rebuild(
+            {(cx, cy) for cx in range(self.cluster_cols) for cy in range(self.cluster_rows)}
+        )
+
+    def set_cell(self, cell, value):
+
+        """
+        Change one cell of the grid. The clusters it affects are rebuilt
+        before the next query.
+
+        Args:
+            cell (tuple): (col, row) of the cell.
+            value (int): New cell value, 0 for an obstacle, 1 for walkable.
+
+        """
+
+        index = cell[0] * self.rows + cell[1]
+        if self.cells[index] != value:
+            self.cells[index] = value
+            self._dirty.add(self._cluster_of(index))
+
+    def plan(self, start, end, display_message=None, stats=None):
+
+        """
+        Return a path from start to end on the current grid.
+
+        Args:
+            start (tuple): (col, row) start position.
+            end (tuple): (col, row) goal position.
+            display_message (function): Optional function to display
+                messages in GUI.
+            stats (SearchStats): Optional stats object. Only the count of
+                abstract nodes expanded and the "rebuild" and "search"
+                times are filled in.
+
+        Returns:
+            list: Path from start to end as a list of (col, row), one
+                  entry per cell. Returns an empty list if no path is found.
+
+        """
+
+        began = time.perf_counter()
+        if self._dirty:
+            self._rebuild(self._dirty)
+            self._dirty = set()
+        rebuilt = time.perf_counter()
+
+        path = self._query(start, end)
+        if stats is not None:
+            stats.expanded = self.expanded
+            stats.times["rebuild"] = rebuilt - began
+            stats.times["search"] = time.perf_counter() - rebuilt
+
+        log = MessageLog.wrap(display_message)
+        if path:
+            log("Path found! Path: {}", path)
+        else:
+            log("No path found")
+        log(
+            "Expanded {} abstract nodes ({} entrances in {} clusters)",
+            self.expanded,
+            len(self._edges),
+            self.cluster_cols * self.cluster_rows,
+        )
+        return path
+
+    def _cluster_of(self, index):
+        x, y = divmod(index, self.rows)
+        return (x // self.cluster_size, y // self.cluster_size)
+
+    def _cluster_bounds(self, cluster):
+        # Inclusive-exclusive (x0, x1, y0, y1) cell bounds of a cluster
+        size = self.cluster_size
+        x0 = cluster[0] * size
+        y0 = cluster[1] * size
+        return x0, min(x0 + size, self.cols), y0, min(y0 + size, self.rows)
+
+    def _cluster_neighbors(self, cluster):
+        cx, cy = cluster
+        for nx, ny in ((cx + 1, cy), (cx - 1, cy), (cx, cy + 1), (cx, cy - 1)):
+            if 0 <= nx < self.cluster_cols and 0 <= ny < self.cluster_rows:
+                yield (nx, ny)
+
+    def _find_entrances(self, first, second):
+        # Place entrances on the border between two neighbouring clusters,
+        # first being the cluster with the lower coordinates
+        x0, x1, y0, y1 = self._cluster_bounds(first)
+        if second[0] != first[0]:
+            # Vertical border between column x1 - 1 and column x1
+            pairs = [
+                ((x1 - 1) * self.rows + y, x1 * self.rows + y) for y in range(y0, y1)
+            ]
+        else:
+            # Horizontal border between row y1 - 1 and row y1
+            pairs = [
+                (x * self.rows + y1 - 1, x * self.rows + y1) for x in range(x0, x1)
+            ]
+
+        entrances = []
+        run = []
+        for a, b in pairs + [(None, None)]:
+            if a is not None and self.cells[a] and self.cells[b]:
+                run.append((a, b))
+                continue
+            if len(run) >= self.LONG_ENTRANCE:
+                entrances.append(run[0])
+                entrances.append(run[-1])
+            elif run:
+                entrances.append(run[len(run) // 2])
+            run = []
+        return entrances
+
+    def _rebuild(self, clusters):
+        # Borders of changed clusters may gain or lose entrances, which in
+        # turn changes the entrances of the clusters on the other side
+        affected = set(clusters)
+        for cluster in clusters:
+            affected.update(self._cluster_neighbors(cluster))
+
+        for cluster in clusters:
+            for neighbor in self._cluster_neighbors(cluster):
+                key = (min(cluster, neighbor), max(cluster, neighbor))
+                self._borders[key] = self._find_entrances(*key)
+
+        for cluster in affected:
+            for node in self._nodes.get(cluster, ()):
+                self._edges.pop(node, None)
+
+        for cluster in affected:
+            nodes = set()
+            for neighbor in self._cluster_neighbors(cluster):
+                key = (min(cluster, neighbor), max(cluster, neighbor))
+                side = 0 if key[0] == cluster else 1
+                for pair in self._borders[key]:
+                    nodes.add(pair[side])
+            self._nodes[cluster] = nodes
+            for node in nodes:
+                self._edges[node] = {}
+
+        # Edges between clusters join the two cells of an entrance
+        for cluster in affected:
+            for neighbor in self._cluster_neighbors(cluster):
+                key = (min(cluster, neighbor), max(cluster, neighbor))
+                for a, b in self._borders[key]:
+                    self._edges[a][b] = 1
+                    self._edges[b][a] = 1
+
+        # Edges inside a cluster join every pair of connected entrances
+        for cluster in affected:
+            nodes = self._nodes[cluster]
+            for node in nodes:
+                distances, _ = self._local_search(node, cluster)
+                for other in nodes:
+                    if other != node and other in distances:
+                        self._edges[node][other] = distances[other]
+
+    def _local_search(self, source, cluster):
+        # Breadth-first search from source that stays inside one cluster.
+        # Returns the distance and parent of every cell it reaches.
+        x0, x1, y0, y1 = self._cluster_bounds(cluster)
+        rows = self.rows
+        cells = self.cells
+        distances = {source: 0}
+        parents = {source: None}
+        frontier = [source]
+        while frontier:
+            next_frontier = []
+            for index in frontier:
+                x, y = divmod(index, rows)
+                step = distances[index] + 1
+                for nx, ny, neighbor in (
+                    (x + 1, y, index + rows),
+                    (x - 1, y, index - rows),
+                    (x, y + 1, index + 1),
+                    (x, y - 1, index - 1),
+                ):
+                    if not (x0 <= nx < x1 and y0 <= ny < y1):
+                        continue
+                    if cells[neighbor] == 0 or neighbor in distances:
+                        continue
+                    distances[neighbor] = step
+                    parents[neighbor] = index
+                    next_frontier.append(neighbor)
+            frontier = next_frontier
+        return distances, parents
+
+    def _query(self, start, end):
+        self.expanded = 0
+        start_index = start[0] * self.rows + start[1]
+        end_index = end[0] * self.rows + end[1]
+        if self.cells[start_index] == 0 or self.cells[end_index] == 0:
+            return []
+        if start_index == end_index:
+            return [start]
+
+        # Connect start and end to the entrances of their own clusters
+        start_cluster = self._cluster_of(start_index)
+        end_cluster = self._cluster_of(end_index)
+        extra = {start_index: {}}
+        distances, _ = self._local_search(start_index, start_cluster)
+        for node in self._nodes[start_cluster]:
+            if node in distances:
+                extra[start_index][node] = distances[node]
+        if start_cluster == end_cluster and end_index in distances:
+            extra[start_index][end_index] = distances[end_index]
+        distances, _ = self._local_search(end_index, end_cluster)
+        for node in self._nodes[end_cluster]:
+            if node in distances:
+                extra.setdefault(node, {})[end_index] = distances[node]
+
+        # A* over the abstract graph
+        rows = self.rows
+        end_x, end_y = end
+
+        def heuristic(index):
+            x, y = divmod(index, rows)
+            return abs(x - end_x) + abs(y - end_y)
+
+        g_score = {start_index: 0}
+        came_from = {}
+        closed_set = set()
+        open_set = [(heuristic(start_index), 0, start_index)]
+        while open_set:
+            _, current_g, current = heapq.heappop(open_set)
+            if current in closed_set or current_g > g_score[current]:
+                continue
+            closed_set.add(current)
+            self.expanded += 1
+            if current == end_index:
+                break
+            for edges in (self._edges.get(current), extra.get(current)):
+                if not edges:
+                    continue
+                for neighbor, cost in edges.items():
+                    new_g_score = current_g + cost
+                    if new_g_score < g_score.get(neighbor, float("inf")):
+                        g_score[neighbor] = new_g_score
+                        came_from[neighbor] = current
+                        heapq.heappush(
+                            open_set,
+                            (new_g_score + heuristic(neighbor), new_g_score, neighbor),
+                        )
+        else:
+            return []
+
+        abstract_path = [end_index]
+        while abstract_path[-1] != start_index:
+            abstract_path.append(came_from[abstract_path[-1]])
+        abstract_path.reverse()
+
+        # Refine every abstract edge into cells
+        path = [start]
+        for a, b in zip(abstract_path, abstract_path[1:]):
+            if self._cluster_of(a) != self._cluster_of(b):
+                path.append(divmod(b, rows))  # Edge across a border
+                continue
+            _, parents = self._local_search(a, self._cluster_of(a))
+            segment = []
+            while b != a:
+                segment.append(divmod(b, rows))
+                b = parents[b]
+            segment.reverse()
+            path.extend(segment)
+        return path
+
+
+class FlowFieldPlanner:
+
+    """
+    Planner that answers every query to a goal from one distance field.
+
+    The first query to a goal runs a breadth-first search backwards from
+    the goal over the whole grid, recording the distance of every cell.
+    From then on a path from any start is read off by stepping to a
+    neighbour one step closer to the goal, in O(path length), which suits
+    many agents heading for the same goal. Fields are cached per goal and
+    set_cell repairs them in place: a new obstacle only recomputes the
+    cells whose distances ran through it, and a removed one only lowers
+    the distances it shortens. Moves are 4-connected and every walkable
+    cell costs 1 to enter, whatever its value, so distances count steps
+    and, unlike do_a_star, cell costs are ignored.
+
+    Args:
+        grid (list of list or numpy.ndarray): Grid as accepted by do_a_star.
+            The planner keeps its own copy, use set_cell to change it.
+        max_fields (int): Number of goals whose fields are kept, the least
+            recently used one is dropped first.
+
+    """
+
+    UNREACHED = -1  # Distance of obstacles and cells with no path to the goal
+
+    def __init__(self, grid, max_fields=4):
+        flat = FlatGrid(grid)
+        self.cols = flat.cols
+        self.rows = flat.rows
+        self.cells = bytearray(flat.cells)
+        self.max_fields = max_fields
+        self.expanded = 0  # Cells settled by the last call to plan
+        self._fields = OrderedDict()  # goal index -> array of distances
+
+    def set_cell(self, cell, value):
+
+        """
+        Change one cell of the grid and repair the cached fields.
+
+        Args:
+            cell (tuple): (col, row) of the cell.
+            value (int): New cell value, 0 for an obstacle, 1 for walkable.
+
+        """
+
+        index = cell[0] * self.rows + cell[1]
+        was_free = self.cells[index] != 0
+        self.cells[index] = value
+        if was_free == (value != 0):
+            return
+        for goal, field in list(self._fields.items()):
+            if index == goal:
+                del self._fields[goal]  # Built again on the next query
+            elif value != 0:
+                self._open(field, index)
+            else:
+                self._close(field, index)
+
+    def distance_field(self, goal):
+
+        """
+        Return the distance of every cell from goal, building it if needed.
+
+        Args:
+            goal (tuple): (col, row) of the goal.
+
+        Returns:
+            array: Distances indexed by col * rows + row, UNREACHED for
+                   obstacles and cells that cannot reach the goal.
+
+        """
+
+        index = goal[0] * self.rows + goal[1]
+        field = self._fields.get(index)
+        if field is None:
+            field = array("i", [self.UNREACHED]) * (self.cols * self.rows)
+            if self.cells[index] != 0:
+                field[index] = 0
+                self._spread(field, [index])
+            self._fields[index] = field
+            while len(self._fields) > self.max_fields:
+                self._fields.popitem(last=False)
+        else:
+            self._fields.move_to_end(index)
+        return field
+
+    def plan(self, start, end, display_message=None, stats=None):
+
+        """
+        Return the shortest path from start to end on the current grid.
+
+        Args:
+            start (tuple): (col, row) start position.
+            end (tuple): (col, row) goal position.
+            display_message (function): Optional function to display
+                messages in GUI.
+            stats (SearchStats): Optional stats object. Only the count of
+                cells settled and the "field" and "path" times are filled
+                in.
+
+        Returns:
+            list: Shortest path from start to end as a list of (col, row).
+                  Returns an empty list if no path is found.
+
+        """
+
+        began = time.perf_counter()
+        self.expanded = 0
+        field = self.distance_field(end)
+        built = time.perf_counter()
+        path = self._descend(field, start)
+
+        if stats is not None:
+            stats.expanded = self.expanded
+            stats.times["field"] = built - began
+            stats.times["path"] = time.perf_counter() - built
+
+        log = MessageLog.wrap(display_message)
+        if path:
+            log("Path found! Path: {}", path)
+        else:
+            log("No path found")
+        log("Settled {} cells ({} goal fields cached)", self.expanded, len(self._fields))
+        return path
+
+    def plan_many(self, starts, end):
+        """Return the path from each start to end, sharing one field."""
+        field = self.distance_field(end)
+        return [self._descend(field, start) for start in starts]
+
+    def _descend(self, field, start):
+        # Step to a neighbour one closer to the goal until the goal is reached
+        current = start[0] * self.rows + start[1]
+        distance = field[current]
+        if distance == self.UNREACHED:
+            return []
+        path = [tuple(start)]
+        while distance > 0:
+            for neighbor in _neighbors(current, self.cols, self.rows):
+                if field[neighbor] == distance - 1:
+                    current = neighbor
+                    distance -= 1
+                    break
+            path.append(divmod(current, self.rows))
+        return path
+
+    def _spread(self, field, frontier):
+        # Breadth-first search outwards from cells whose distances are
+        # final, lowering every distance it can improve
+        cells = self.cells
+        while frontier:
+            next_frontier = []
+            for index in frontier:
+                self.expanded += 1
+                distance = field[index] + 1
+                for neighbor in _neighbors(index, self.cols, self.rows):
+                    if cells[neighbor] != 0 and (
+                        field[neighbor] == self.UNREACHED or field[neighbor] > distance
+                    ):
+                        field[neighbor] = distance
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+
+    def _open(self, field, index):
+        # A new walkable cell takes its distance from its best neighbour
+        # and passes any improvement on
+        best = self.UNREACHED
+        for neighbor in _neighbors(index, self.cols, self.rows):
+            distance = field[neighbor]
+            if distance != self.UNREACHED and (best == self.UNREACHED or distance < best):
+                best = distance
+        if best != self.UNREACHED:
+            field[index] = best + 1
+            self._spread(field, [index])
+
+    def _close(self, field, index):
+        # Distances only went through the closed cell if they were one more
+        # than its distance. Level by level, a cell loses its distance when
+        # no neighbour one step closer to the goal is left.
+        distance = field[index]
+        field[index] = self.UNREACHED
+        if distance == self.UNREACHED:
+            return
+        lost = []
+        frontier = [
+            neighbor for neighbor in _neighbors(index, self.cols, self.rows)
+            if field[neighbor] == distance + 1
+        ]
+        while frontier:
+            distance += 1
+            next_frontier = []
+            for cell in frontier:
+                if field[cell] != distance:
+                    continue  # Already lost through another neighbour
+                if any(field[n] == distance - 1 for n in _neighbors(cell, self.cols, self.rows)):
+                    continue  # Still one step from a cell closer to the goal
+                field[cell] = self.UNREACHED
+                lost.append(cell)
+                for neighbor in _neighbors(cell, self.cols, self.rows):
+                    if field[neighbor] == distance + 1:
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+
+        # Refill the lost cells from the distances still around them, in
+        # order of distance so every cell is settled once
+        open_set = []
+        for cell in lost:
+            best = self.UNREACHED
+            for neighbor in _neighbors(cell, self.cols, self.rows):
+                value = field[neighbor]
+                if value != self.UNREACHED and (best == self.UNREACHED or value < best):
+                    best = value
+            if best != self.UNREACHED:
+                heapq.heappush(open_set, (best + 1, cell))
+        while open_set:
+            value, cell = heapq.heappop(open_set)
+            if field[cell] != self.UNREACHED and field[cell] <= value:
+                continue
+            field[cell] = value
+            self.expanded += 1
+            for neighbor in _neighbors(cell, self.cols, self.rows):
+                if self.cells[neighbor] != 0 and (
+                    field[neighbor] == self.UNREACHED or field[neighbor] > value + 1
+                ):
+                    heapq.heappush(open_set, (value + 1, neighbor))
+
+
+# Goals whose distances CooperativePlanner keeps, one per distinct goal in
+# use is enough for every agent to reuse them
+COOPERATIVE_MAX_FIELDS = 1024
+
+
+class GoalDistances:
+
+    """
+    Distances from every cell to one goal, found only as far as needed.
+
+    A breadth-first search runs backwards from the goal and stops as soon
+    as the cell asked for is reached. The next query resumes it where it
+    stopped, so the distances of an area are computed once however many
+    searches ask for them. Moves are 4-connected and every walkable cell
+    costs 1 to enter, whatever its value, so distances count steps, as
+    the moves of CooperativePlanner do.
+
+    Args:
+        flat (FlatGrid): Grid, which must not change while this is in use.
+        goal (int): Flat index of the goal.
+
+    """
+
+    UNKNOWN = -1  # Distance of cells not reached yet, or never reachable
+
+    def __init__(self, flat, goal):
+        self.cols = flat.cols
+        self.rows = flat.rows
+        self.cells = flat.cells
+        self.distances = array("i", [self.UNKNOWN]) * len(flat)
+        self.frontier = []  # Cells reached but not yet expanded, in order
+        self.position = 0  # Next cell of frontier to expand
+        if flat.cells[goal] != 0:
+            self.distances[goal] = 0
+            self.frontier.append(goal)
+
+    def get(self, index):
+
+        """
+        Return the distance from a cell to the goal.
+
+        Args:
+            index (int): Flat index of the cell.
+
+        Returns:
+            int: Number of moves, UNKNOWN for obstacles and cells with no
+                 path to the goal.
+
+        """
+
+        distances = self.distances
+        if distances[index] != self.UNKNOWN or self.cells[index] == 0:
+            return distances[index]
+        COL = self.cols
+        ROW = self.rows
+        UNKNOWN = self.UNKNOWN
+        cells = self.cells
+        frontier = self.frontier
+        position = self.position
+        while position < len(frontier) and distances[index] == UNKNOWN:
+            cell = frontier[position]
+            position += 1
+            distance = distances[cell] + 1
+            for neighbor in _neighbors(cell, COL, ROW):
+                if distances[neighbor] == UNKNOWN and cells[neighbor] != 0:
+                    distances[neighbor] = distance
+                    frontier.append(neighbor)
+        self.position = position
+        return distances[index]
+
+
+class ReservationTable:
+
+    """
+    Space-time reservations of the agents planned so far.
+
+    A cell is reserved at a time step when an agent is in it then, and a
+    move when an agent makes it between two time steps, so that two
+    agents can neither meet in a cell nor swap places. An agent that has
+    reached its goal stays parked there for good. Reservations are kept
+    in sets of integer keys, time step * cells + index for cells.
+
+    Args:
+        size (int): Number of cells of the grid (cols * rows).
+
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.cells = set()  # time_step * size + index
+        self.moves = set()  # (time_step * size + from index) * size + to index
+        self.parked = {}  # index -> time step from which an agent stays there
+        self.last_use = {}  # index -> last time step the cell is reserved
+        self.horizon = 0  # No reservation changes after this time step
+
+    def __len__(self):
+        return len(self.cells)
+
+    def is_free(self, index, time_step):
+        """Return True if no agent is in the cell at the time step."""
+        parked = self.parked.get(index)
+        if parked is not None and time_step >= parked:
+            return False
+        return time_step * self.size + index not in self.cells
+
+    def is_move_free(self, index, next_index, time_step):
+        """Return True if no agent moves the other way between the cells at the time step."""
+        return (time_step * self.size + next_index) * self.size + index not in self.moves
+
+    def can_park(self, index, time_step):
+        """Return True if an agent may stay in the cell from the time step on."""
+        return self.last_use.get(index, -1) < time_step and index not in self.parked
+
+    def reserve(self, path, start_time=0):
+
+        """
+        Reserve the cells and moves of a path, parking its agent at the end.
+
+        Args:
+            path (list): Flat cell index of the agent at each time step.
+            start_time (int): Time step of the first entry of path.
+
+        """
+
+        size = self.size
+        for step, index in enumerate(path):
+            time_step = start_time + step
+            self.cells.add(time_step * size + index)
+            if time_step > self.last_use.get(index, -1):
+                self.last_use[index] = time_step
+            if step > 0:
+                self.moves.add(((time_step - 1) * size + path[step - 1]) * size + index)
+        end_time = start_time + len(path) - 1
+        self.parked[path[-1]] = end_time
+        self.horizon = max(self.horizon, end_time)
+
+    def clear(self):
+        """Remove every reservation."""
+        self.cells.clear()
+        self.moves.clear()
+        self.parked.clear()
+        self.last_use.clear()
+        self.horizon = 0
+
+
+class CooperativePlanner:
+
+    """
+    Cooperative A* for many agents sharing one grid.
+
+    Agents are planned one at a time in priority order. Each search runs
+    over (cell, time) states, may wait in place for a step, and avoids
+    the cells and moves that the agents planned before it have reserved
+    in a ReservationTable, so the resulting paths never collide. Its
+    heuristic is the agent's exact distance to its goal ignoring the
+    other agents, from a GoalDistances search per goal. That search is
+    shared by every agent heading to the goal and by every later call and
+    only grows when a query needs a cell it has not reached yet, so the
+    heuristic soon costs nothing and keeps each search close to the path
+    it finds.
+
+    Moves are 4-connected and every move or wait costs 1, whatever the
+    value of the cell, so cell costs are ignored. Planning in
+    priority order is fast but not complete: an agent can be left with no
+    path when those before it block its way. It then gets an empty path
+    and stays parked at its start, so the agents after it plan around it.
+    Only an earlier agent whose path already runs through that start can
+    still meet it there, which planning it later cannot undo.
+
+    Args:
+        grid (list of list or numpy.ndarray): Grid as accepted by do_a_star.
+            The planner keeps its own copy, use set_cell to change it.
+        max_fields (int): Number of goals whose distances are kept, the
+            least recently used one is dropped first.
+        max_expansions (int): Optional limit on the states one agent's
+            search may expand. An agent that reaches it gets an empty path,
+            which bounds the time spent on agents that are boxed in.
+
+    """
+
+    def __init__(self, grid, max_fields=COOPERATIVE_MAX_FIELDS, max_expansions=None):
+        flat = FlatGrid(grid)
+        self.cols = flat.cols
+        self.rows = flat.rows
+        self.cells = bytearray(flat.cells)
+        self.max_fields = max_fields
+        self.max_expansions = max_expansions
+        self._distances = OrderedDict()  # goal index -> GoalDistances
+        self.reservations = ReservationTable(self.cols * self.rows)
+        self.expanded = 0  # States expanded by the last call
+
+    def set_cell(self, cell, value):
+
+        """
+        Change one cell of the grid. The goal distances are dropped, and
+        existing reservations are kept, so plan the agents again after
+        changing cells they use.
+
+        Args:
+            cell (tuple): (col, row) of the cell.
+            value (int): New cell value, 0 for an obstacle, 1 for walkable.
+
+        """
+
+        self.cells[cell[0] * self.rows + cell[1]] = value
+        self._distances.clear()
+
+    def clear(self):
+        """Drop every reservation, keeping the goal distances."""
+        self.reservations.clear()
+
+    def plan_agents(self, agents, display_message=None, should_stop=None, stats=None):
+
+        """
+        Plan collision-free paths for many agents.
+
+        Reservations from earlier calls are dropped first, the goal
+        distances are kept.
+
+        Args:
+            agents (list): ((col, row) start, (col, row) end) of each agent,
+                highest priority first.
+            display_message (function): Optional function to display
+                messages in GUI.
+            should_stop (function): Optional cancellation check, see
+                a_star_search.
+            stats (SearchStats): Optional stats object. The counters add
+                up the searches of every agent.
+
+        Returns:
+            list: One path per agent, in the same order. A path holds the
+                  (col, row) of the agent at every time step from 0 until
+                  it reaches its goal, so a wait repeats the cell. Agents
+                  with no path get an empty list.
+
+        """
+
+        began = time.perf_counter()
+        log = MessageLog.wrap(display_message)
+        self.reservations.clear()
+        expanded = 0
+        paths = []
+        for start, end in agents:
+            paths.append(self.plan_agent(start, end, should_stop=should_stop))
+            expanded += self.expanded
+        self.expanded = expanded
+
+        if stats is not None:
+            stats.expanded = expanded
+            stats.times["search"] = time.perf_counter() - began
+        failed = sum(1 for path in paths if not path)
+        log("Planned {} agents, {} without a path", len(paths), failed, type="INFO")
+        log("Expanded {} states", expanded)
+        return paths
+
+    def plan_agent(self, start, end, start_time=0, should_stop=None):
+
+        """
+        Plan one agent around the current reservations and reserve its path.
+
+        Use this to add an agent to those already planned, for example
+        one that joins at a later time step.
+
+        Args:
+            start (tuple): (col, row) of the agent at start_time.
+            end (tuple): (col, row) goal position.
+            start_time (int): Time step the agent starts at.
+            should_stop (function): Optional cancellation check, see
+                a_star_search.
+
+        Returns:
+            list: (col, row) of the agent at every time step from
+                  start_time until it reaches its goal, or an empty list
+                  if it cannot get there (or hits max_expansions). An
+                  agent with no path is reserved as parked at its start
+                  from start_time on, unless an earlier agent uses that
+                  cell later.
+
+        """
+
+        ROW = self.rows
+        COL = self.cols
+        size = COL * ROW
+        cells = self.cells
+        table = self.reservations
+        start_index = start[0] * ROW + start[1]
+        end_index = end[0] * ROW + end[1]
+        self.expanded = 0
+
+        goal_distances = self._distances.get(end_index)
+        if goal_distances is None:
+            goal_distances = GoalDistances(FlatGrid.from_buffer(cells, COL, ROW), end_index)
+            self._distances[end_index] = goal_distances
+            while len(self._distances) > self.max_fields:
+                self._distances.popitem(last=False)
+        else:
+            self._distances.move_to_end(end_index)
+        distances = goal_distances.distances
+        UNKNOWN = GoalDistances.UNKNOWN
+        if goal_distances.get(start_index) == UNKNOWN or not table.is_free(start_index, start_time):
+            self._park_at_start(start_index, start_time)
+            return []
+
+        # Nothing changes after the last reserved time step, so from then on
+        # a state only depends on its cell. Closing states by (cell,
+        # min(time, limit)) keeps the search finite when there is no path.
+        limit = max(table.horizon, start_time) + 1
+        moves = ((0, 0, 0), (1, 0, ROW), (-1, 0, -ROW), (0, 1, 1), (0, -1, -1))
+
+        # The agent can only park once nobody else uses the goal any more,
+        # which bounds its arrival time from below as well. Among states of
+        # equal f the latest one is expanded first, so an agent that has to
+        # wait walks up and waits near the goal instead of the search
+        # spreading over every cell it could wait in.
+        earliest_arrival = table.last_use.get(end_index, -1) + 1
+
+        start_key = start_time * size + start_index
+        came_from = {start_key: -1}  # time * size + index -> key of the previous state
+        closed_set = set()
+        h_score = distances[start_index]
+        open_set = [(
+            max(start_time + h_score, earliest_arrival), h_score, -start_time, start_index
+        )]
+        goal_key = -1
+        while open_set:
+            _, _, current_time, current = heapq.heappop(open_set)
+            current_time = -current_time
+            closed_key = min(current_time, limit) * size + current
+            if closed_key in closed_set:
+                continue
+            closed_set.add(closed_key)
+            self.expanded += 1
+            if self.expanded == self.max_expansions:
+                break
+            if should_stop is not None and self.expanded % STOP_CHECK_INTERVAL == 0 \
+                    and should_stop():
+                raise SearchCancelled(
+                    "Search stopped after {} expansions".format(self.expanded)
+                )
+
+            if current == end_index and table.can_park(current, current_time):
+                goal_key = current_time * size + current
+                break
+
+            x, y = divmod(current, ROW)
+            next_time = current_time + 1
+            current_key = current_time * size + current
+            for dx, dy, offset in moves:
+                if not (0 <= x + dx < COL and 0 <= y + dy < ROW):
+                    continue
+                neighbor = current + offset
+                h_score = distances[neighbor]
+                if h_score == UNKNOWN:
+                    h_score = goal_distances.get(neighbor)
+                    if h_score == UNKNOWN:
+                        continue  # Obstacle, or cut off from the goal
+                if not table.is_free(neighbor, next_time):
+                    continue
+                if offset and not table.is_move_free(current, neighbor, current_time):
+                    continue
+                if min(next_time, limit) * size + neighbor in closed_set:
+                    continue
+                neighbor_key = next_time * size + neighbor
+                if neighbor_key in came_from:
+                    continue  # Already queued, every state at a time step costs the same
+                came_from[neighbor_key] = current_key
+                heapq.heappush(open_set, (
+                    max(next_time + h_score, earliest_arrival), h_score, -next_time, neighbor
+                ))
+
+        if goal_key < 0:
+            self._park_at_start(start_index, start_time)
+            return []
+        indexes = []
+        key = goal_key
+        while key != -1:
+            indexes.append(key % size)
+            key = came_from[key]
+        indexes.reverse()
+        table.reserve(indexes, start_time)
+        return [divmod(index, ROW) for index in indexes]
+
+    def _park_at_start(self, index, start_time):
+        # An agent left without a path stays where it is, so keep the
+        # agents planned after it out of its start cell
+        if self.cells[index] != 0 and self.reservations.can_park(index, start_time):
+            self.reservations.reserve([index], start_time)
+
+
+# Grid shared with the current batch worker process, see BatchPlanner
+_batch_grid = None
+
+
+def _no_message(message, type="DEBUG"):
+    pass
+
+
+def _attach_batch_grid(name, cols, rows, min_cost):
+    # Pool initializer: map the shared grid into this worker process
+    from multiprocessing import shared_memory
+
+    global _batch_grid
+    memory = shared_memory.SharedMemory(name=name)
+    flat = FlatGrid.from_buffer(memory.buf, cols, rows)
+    flat.min_cost = min_cost
+    _batch_grid = (memory, flat)
+
+
+def _run_batch_query(task):
+    # Run one batch query and return its path, or None if it timed out,
+    # with the stats of its search and the seconds it took
+    began = time.perf_counter()
+    start, end, mode, diagonal, timeout = task
+    should_stop = None
+    if timeout is not None:
+        deadline = time.monotonic() + timeout
+        should_stop = lambda: time.monotonic() > deadline
+    stats = SearchStats()
+    try:
+        path = plan(
+            _batch_grid[1], start, end, _no_message, mode, diagonal, should_stop,
+            stats=stats, time_budget=timeout,
+        )
+    except SearchCancelled:
+        path = None
+    return path, stats, time.perf_counter() - began
+
+
+class BatchPlanner:
+
+    """
+    Worker processes that share one copy of a grid for many queries.
+
+    The grid is copied once into shared memory that every worker process
+    maps, instead of being pickled for each query, and the pool and the
+    copy are kept until close, so any number of imap calls pay for them
+    only once. Use it as a context manager or call close.
+
+    Args:
+        grid (list of list or numpy.ndarray): Grid as accepted by do_a_star.
+        workers (int): Number of worker processes, defaults to the number
+            of CPUs. With 1 worker the queries run in this process.
+
+    """
+
+    def __init__(self, grid, workers=None):
+        self.flat = FlatGrid(grid)
+        self.min_cost = _grid_min_cost(grid, self.flat)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+        self._pool = None
+        self._memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def imap(self, queries, mode="astar", diagonal=None, timeout=None, components=None):
+
+        """
+        Plan queries, giving each answer as soon as it and those before
+        it are done.
+
+        Args:
+            queries (list): List of ((col, row) start, (col, row) end) pairs.
+            mode (str): Name of a plain (not stateful) planner, such as
+                "astar", "jps", "anytime", "bidir" or "theta".
+            diagonal (bool): 8-connected movement, defaults to DIAGONAL_MOVES.
+            timeout (float): Optional time limit in seconds for each query.
+                In "anytime" mode it is the time budget (ANYTIME_TIME_BUDGET
+                without one) and the best path found in time is returned.
+            components (ComponentIndex): Optional component labels of the
+                grid. Queries whose ends are not connected are answered
+                with an empty list without being searched.
+
+        Returns:
+            iterator: (path, stats, seconds) per query, in order. path is
+                      a list of (col, row), an empty list if there is no
+                      path, or None if the query ran out of time. stats is
+                      the SearchStats of the search, None if it was not
+                      searched, and its bound holds the bound of "anytime"
+                      paths. seconds is the time the query took in its
+                      worker.
+
+        """
+
+        if get_planner(mode).stateful:
+            raise ValueError("Batch planning does not support mode: {}".format(mode))
+        diagonal = DIAGONAL_MOVES if diagonal is None else diagonal
+        skipped = {}  # Position -> seconds of the queries that are not searched
+        tasks = []
+        for position, (start, end) in enumerate(queries):
+            began = time.perf_counter()
+            if components is not None and not components.connected(start, end):
+                skipped[position] = time.perf_counter() - began
+                continue
+            tasks.append((tuple(start), tuple(end), mode, diagonal, timeout))
+
+        if self.workers <= 1 or len(tasks) <= 1:
+            answers = map(self._run_here, tasks)
+        else:
+            # Small chunks keep the answers streaming out in order
+            chunk_size = max(1, min(16, len(tasks) // (self.workers * 4)))
+            answers = self._open_pool().imap(_run_batch_query, tasks, chunk_size)
+        return self._merge(len(queries), skipped, answers)
+
+    @staticmethod
+    def _merge(count, skipped, answers):
+        # Put the answers of the unsearched queries back among the others
+        for position in range(count):
+            if position in skipped:
+                yield [], None, skipped[position]
+            else:
+                yield next(answers)
+
+    def _run_here(self, task):
+        global _batch_grid
+
+        previous = _batch_grid
+        _batch_grid = (None, self.flat)
+        try:
+            return _run_batch_query(task)
+        finally:
+            _batch_grid = previous
+
+    def _open_pool(self):
+        if self._pool is None:
+            from multiprocessing import Pool, shared_memory
+
+            flat = self.flat
+            self._memory = shared_memory.SharedMemory(create=True, size=max(len(flat), 1))
+            self._memory.buf[:len(flat)] = flat.cells
+            self._pool = Pool(
+                self.workers,
+                initializer=_attach_batch_grid,
+                initargs=(self._memory.name, flat.cols, flat.rows, self.min_cost),
+            )
+        return self._pool
+
+    def close(self):
+        """Stop the worker processes and free the shared grid."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        if self._memory is not None:
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+
+
+def plan_batch(grid, queries, mode="astar", diagonal=None, workers=None, timeout=None,
+               components=None, stats=None):
+
+    """
+    Plan many (start, end) queries on the same grid in parallel.
+
+    Runs the queries through a BatchPlanner that is closed afterwards.
+    Keep a BatchPlanner instead to run several batches on one grid.
+
+    Args:
+        grid (list of list or numpy.ndarray): Grid as accepted by do_a_star.
+        queries (list): List of ((col, row) start, (col, row) end) pairs.
+        mode (str): Name of a plain (not stateful) planner, see
+            BatchPlanner.imap.
+        diagonal (bool): 8-connected movement, defaults to DIAGONAL_MOVES.
+        workers (int): Number of worker processes, see BatchPlanner.
+        timeout (float): Optional time limit in seconds for each query,
+            see BatchPlanner.imap.
+        components (ComponentIndex): Optional component labels of grid,
+            see BatchPlanner.imap.
+        stats (list): Optional list that is filled with one SearchStats
+            per query, in the same order, or None for the queries that
+            were not searched. Its bound holds the bound of "anytime"
+            paths.
+
+    Returns:
+        list: One entry per query, in the same order: the path as a list of
+              (col, row), an empty list if there is no path, or None if
+              the query ran out of time.
+
+    """
+
+    results = []
+    if stats is not None:
+        del stats[:]
+    with BatchPlanner(grid, workers) as batch:
+        for path, search_stats, _ in batch.imap(queries, mode, diagonal, timeout, components):
+            results.append(path)
+            if stats is not None:
+                stats.append(search_stats)
+    return results
+
+
+def _breadth_first_distances(flat, source):
+    # Number of 4-connected steps from source to every cell, -1 if the
+    # cell cannot be reached
+    COL = flat.cols
+    ROW = flat.rows
+    cells = flat.cells
+    distances = array("i", [-1]) * len(flat)
+    distances[source] = 0
+    frontier = [source]
+    step = 0
+    while frontier:
+        step += 1
+        next_frontier = []
+        for index in frontier:
+            for neighbor in _neighbors(index, COL, ROW):
+                if cells[neighbor] != 0 and distances[neighbor] < 0:
+                    distances[neighbor] = step
+                    next_frontier.append(neighbor)
+        frontier = next_frontier
+    return distances
+
+
+class LandmarkTable:
+
+    """
+    Exact distances from a few landmark cells, for the ALT heuristic.
+
+    By the triangle inequality, |d(L, n) - d(L, goal)| is a lower bound on
+    the distance from n to the goal for every landmark L. On maze-like
+    maps this bound is far tighter than the straight-line distance.
+    Distances count 4-connected steps, so the bound holds for any grid
+    whose moves cost at least 1.
+
+    A table is only valid for the grid it was built from. Use build to
+    make one, and save/load (or load_or_build_landmarks) to reuse it.
+
+    """
+
+    MAGIC = b"ALT1"
+
+    def __init__(self, cols, rows, digest, landmarks, tables):
+        self.cols = cols
+        self.rows = rows
+        self.digest = digest  # SHA-1 of the grid cells the table was built for
+        self.landmarks = landmarks  # Flat indices of the landmark cells
+        self.tables = tables  # One array of distances per landmark, -1 if unreachable
+
+    @classmethod
+    def build(cls, grid, count=8):
+
+        """
+        Pick landmarks and compute their distance tables.
+
+        Landmarks are picked by farthest-point selection: each new landmark
+        is the walkable cell farthest from every landmark picked so far,
+        and cells no landmark can reach yet are picked first.
+
+        Args:
+            grid (list of list or numpy.ndarray): Grid as accepted by do_a_star.
+            count (int): Number of landmarks.
+
+        Returns:
+            LandmarkTable: The table.
+
+        """
+
+        flat = FlatGrid(grid)
+        cells = flat.cells
+        free = [index for index in range(len(flat)) if cells[index] != 0]
+        landmarks = []
+        tables = []
+        if free:
+            # Start from the cell farthest from an arbitrary walkable cell
+            first = _breadth_first_distances(flat, free[0])
+            candidate = max(free, key=first.__getitem__)
+            nearest = None
+            while len(landmarks) < count:
+                landmarks.append(candidate)
+                distances = _breadth_first_distances(flat, candidate)
+                tables.append(distances)
+                if nearest is None:
+                    nearest = array("i", distances)
+                else:
+                    for index in free:
+                        d = distances[index]
+                        if d >= 0 and (nearest[index] < 0 or d < nearest[index]):
+                            nearest[index] = d
+                best = -1
+                for index in free:
+                    score = nearest[index]
+                    if score < 0:
+                        candidate = index  # Not covered by any landmark yet
+                        break
+                    if score > best:
+                        best = score
+                        candidate = index
+                else:
+                    if best <= 0:
+                        break  # Every walkable cell is already a landmark
+
+        digest = hashlib.sha1(bytes(cells)).digest()
+        return cls(flat.cols, flat.rows, digest, landmarks, tables)
+
+    def matches(self, grid):
+        """Return True if the table was built for this grid."""
+        flat = FlatGrid(grid)
+        return (
+            (flat.cols, flat.rows) == (self.cols, self.rows)
+            and hashlib.sha1(bytes(flat.cells)).digest() == self.digest
+        )
+
+    def lower_bound_to(self, target):
+
+        """
+        Return a function giving the ALT lower bound from a flat cell
+        index to the flat index target.
+
+        """
+
+        INF = float("inf")
+        pairs = [(table, table[target]) for table in self.tables]
+
+        def bound(index):
+            best = 0
+            for table, to_target in pairs:
+                d = table[index]
+                if (d < 0) != (to_target < 0):
+                    return INF  # Only one of the cells reaches this landmark
+                if d >= 0:
+                    difference = abs(d - to_target)
+                    if difference > best:
+                        best = difference
+            return best
+
+        return bound
+
+    def save(self, path):
+        """Write the table to a binary file."""
+        with open(path, "wb") as f:
+            f.write(self.MAGIC)
+            f.write(struct.pack("<III", self.cols, self.rows, len(self.landmarks)))
+            f.write(self.digest)
+            for values in [array("i", self.landmarks)] + self.tables:
+                if sys.byteorder == "big":
+                    values = array("i", values)
+                    values.byteswap()
+                values.tofile(f)
+
+    @classmethod
+    def load(cls, path):
+        """Read a table written by save."""
+        with open(path, "rb") as f:
+            if f.read(4) != cls.MAGIC:
+                raise ValueError("{} is not a landmark table".format(path))
+            cols, rows, count = struct.unpack("<III", f.read(12))
+            digest = f.read(20)
+            landmarks = array("i")
+            landmarks.fromfile(f, count)
+            tables = []
+            for _ in range(count):
+                table = array("i")
+                table.fromfile(f, cols * rows)
+                tables.append(table)
+        if sys.byteorder == "big":
+            for values in [landmarks] + tables:
+                values.byteswap()
+        return cls(cols, rows, digest, list(landmarks), tables)
+
+
+def load_or_build_landmarks(grid, map_path, count=8):
+
+    """
+    Load the landmark table stored next to a map file, or build and save
+    it if it is missing or was built for a different version of the map.
+
+    Args:
+        grid (list of list or numpy.ndarray): The map's grid.
+        map_path (str): Path of the map file. The table is stored as
+            map_path + ".alt".
+        count (int): Number of landmarks when a new table is built.
+
+    Returns:
+        LandmarkTable: A table that matches grid.
+
+    """
+
+    table_path = map_path + ".alt"
+    if os.path.exists(table_path):
+        try:
+            table = LandmarkTable.load(table_path)
+        except (OSError, ValueError, EOFError, struct.error):
+            table = None
+        if table is not None and table.matches(grid):
+            return table
+    table = LandmarkTable.build(grid, count)
+    table.save(table_path)
+    return table
+
+
+class ComponentIndex:
+
+    """
+    Connected-component labels of the walkable cells.
+
+    Two cells are connected (4-connected moves) exactly when they carry
+    the same label, so a query between different components can be
+    rejected in O(1) instead of by searching the whole reachable region.
+    Labels are kept up to date cell by cell with set_cell: opening a cell
+    merges the components around it by relabelling the smaller ones, and
+    closing a cell checks whether its component split with a breadth-first
+    search from each side that stops as soon as the sides meet.
+
+    Args:
+        grid (list of list or numpy.ndarray): Grid as accepted by do_a_star.
+            The index keeps its own copy, use set_cell to change it.
+
+    """
+
+    def __init__(self, grid):
+        flat = FlatGrid(grid)
+        self.cols = flat.cols
+        self.rows = flat.rows
+        self.cells = bytearray(flat.cells)
+        self.labels = array("i", [-1]) * len(flat)  # -1 for obstacles
+        self.sizes = {}  # label -> number of cells
+        self._next_label = 0
+        for index in range(len(flat)):
+            if self.cells[index] != 0 and self.labels[index] < 0:
+                self._flood(index, self._new_label())
+
+    def connected(self, a, b):
+        """Return True if there is a path between cells a and b."""
+        label = self.labels[a[0] * self.rows + a[1]]
+        return label >= 0 and label == self.labels[b[0] * self.rows + b[1]]
+
+    def component(self, cell):
+        """Return the label of a cell, -1 for an obstacle."""
+        return self.labels[cell[0] * self.rows + cell[1]]
+
+    def set_cell(self, cell, value):
+
+        """
+        Change one cell of the grid and update the labels.
+
+        Args:
+            cell (tuple): (col, row) of the cell.
+            value (int): New cell value, 0 for an obstacle, otherwise walkable.
+
+        """
+
+        index = cell[0] * self.rows + cell[1]
+        was_free = self.cells[index] != 0
+        self.cells[index] = value
+        if was_free == (value != 0):
+            return
+        if value != 0:
+            self._open(index)
+        else:
+            self._close(index)
+
+    def _new_label(self):
+        label = self._next_label
+        self._next_label += 1
+        self.sizes[label] = 0
+        return label
+
+    def _flood(self, seed, label):
+        # Give label to every cell connected to seed that does not have it
+        labels = self.labels
+        old = labels[seed]
+        labels[seed] = label
+        frontier = [seed]
+        count = 0
+        while frontier:
+            index = frontier.pop()
+            count += 1
+            for neighbor in _neighbors(index, self.cols, self.rows):
+                if self.cells[neighbor] != 0 and labels[neighbor] == old:
+                    labels[neighbor] = label
+                    frontier.append(neighbor)
+        self.sizes[label] += count
+        if old >= 0:
+            self.sizes[old] -= count
+            if self.sizes[old] == 0:
+                del self.sizes[old]
+
+    def _open(self, index):
+        # Join the new cell to the largest neighbouring component and
+        # relabel the others into it
+        around = {
+            self.labels[n] for n in _neighbors(index, self.cols, self.rows) if self.labels[n] >= 0
+        }
+        if not around:
+            label = self._new_label()
+        else:
+            label = max(around, key=self.sizes.__getitem__)
+        self.labels[index] = label
+        self.sizes[label] += 1
+        for neighbor in _neighbors(index, self.cols, self.rows):
+            if self.labels[neighbor] >= 0 and self.labels[neighbor] != label:
+                self._flood(neighbor, label)
+
+    def _close(self, index):
+        label = self.labels[index]
+        self.labels[index] = -1
+        self.sizes[label] -= 1
+        if self.sizes[label] == 0:
+            del self.sizes[label]
+        seeds = [n for n in _neighbors(index, self.cols, self.rows) if self.cells[n] != 0]
+        if len(seeds) <= 1:
+            return
+
+        # Grow one region from every side of the closed cell, a step at a
+        # time each. Regions that touch are merged. A region that runs out
+        # of cells before meeting the others has been cut off, and only
+        # that (smaller) part is relabelled.
+        owner = {}
+        group = list(range(len(seeds)))
+        frontiers = {}
+        for i, seed in enumerate(seeds):
+            if seed in owner:
+                group[i] = group[owner[seed]]
+                continue
+            owner[seed] = i
+            frontiers[i] = [seed]
+
+        def find(i):
+            while group[i] != i:
+                group[i] = group[group[i]]
+                i = group[i]
+            return i
+
+        while len(frontiers) > 1:
+            for root in list(frontiers):
+                if root not in frontiers or len(frontiers) <= 1:
+                    continue
+                frontier = frontiers[root]
+                if not frontier:
+                    # Cut off: move this part to a new label
+                    del frontiers[root]
+                    region = [cell for cell, region in owner.items() if find(region) == root]
+                    self._flood(region[0], self._new_label())
+                    continue
+                current = frontier.pop()
+                for neighbor in _neighbors(current, self.cols, self.rows):
+                    if self.cells[neighbor] == 0:
+                        continue
+                    other = owner.get(neighbor)
+                    if other is None:
+                        owner[neighbor] = root
+                        frontier.append(neighbor)
+                        continue
+                    other = find(other)
+                    if other != root:
+                        # The regions met, so they are still one component
+                        group[other] = root
+                        frontier.extend(frontiers.pop(other))
+
+
+class PathCache:
+
+    """
+    Bounded least-recently-used cache of solved paths.
+
+    Entries are keyed by a map key chosen by the caller (a version counter
+    or content hash of the map, plus anything else that changes the
+    answer, such as the search mode) and the two end points. Obstacle
+    edits do not need a new map key: pass each edit to invalidate, which
+    only evicts the entries the edit can affect.
+
+    Args:
+        max_size (int): Maximum number of paths kept.
+
+    """
+
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (path, bounds)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, map_key, start, end):
+
+        """
+        Return a copy of the cached path for start and end, or None.
+
+        """
+
+        key = (map_key, tuple(start), tuple(end))
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return list(entry[0])
+
+    def put(self, map_key, start, end, path, cost=None, diagonal=False, any_angle=False):
+
+        """
+        Store a path, evicting the least recently used one if full.
+
+        Args:
+            map_key: Key of the map the path was planned on.
+            start (tuple): (col, row) start position.
+            end (tuple): (col, row) goal position.
+            path (list): The path, an empty list if there is none.
+            cost (float): Cost of the path, see path_cost, or its length
+                for any-angle paths. Defaults to path_length(path), which
+                is only the cost on a grid where every cell costs 1.
+            diagonal (bool): The path was planned with 8-connected moves.
+            any_angle (bool): The path is made of straight segments at any
+                angle, as from do_theta_star or shortcut_path.
+
+        """
+
+        if self.max_size <= 0:
+            return
+        if cost is None:
+            cost = path_length(path)
+        if path:
+            cols = [cell[0] for cell in path]
+            rows = [cell[1] for cell in path]
+            bounds = (
+                min(cols), max(cols), min(rows), max(rows), cost,
+                diagonal or any_angle, any_angle,
+            )
+        else:
+            bounds = None
+        key = (map_key, tuple(start), tuple(end))
+        self._entries[key] = (list(path), bounds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, cell, added):
+
+        """
+        Evict the entries an obstacle edit can affect.
+
+        A new obstacle only breaks paths that pass through it, or that
+        cut the corner between it and a diagonal neighbour, which is
+        checked against the bounding box of each path first. A removed
+        obstacle can only shorten a path of cost C if the new path passes
+        through the cell, where octile(start, cell) + octile(cell, end) < C.
+        With diagonal moves the new path may instead cut the cell's corner
+        between two of its neighbours, so those are tested as well. An
+        any-angle segment only has to cross the cell somewhere, so its
+        Euclidean bound is loosened by the cell's diagonal. A removed
+        obstacle can also make any unsolved query solvable.
+
+        Args:
+            cell (tuple): (col, row) of the edited cell.
+            added (bool): True if an obstacle was added, False if removed.
+
+        """
+
+        x, y = cell
+        cell = tuple(cell)
+        around = [(x + dx, y + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+        stale = []
+        for key, (path, bounds) in self._entries.items():
+            if bounds is None:
+                if not added:
+                    stale.append(key)
+                continue
+            min_x, max_x, min_y, max_y, cost, diagonal, any_angle = bounds
+            if added:
+                if min_x - 1 <= x <= max_x + 1 and min_y - 1 <= y <= max_y + 1 \
+                        and _blocks_path(cell, path, diagonal):
+                    stale.append(key)
+            else:
+                _, start, end = key
+                if any_angle:
+                    shorter = _euclidean(start, cell) + _euclidean(cell, end) - 2 ** 0.5 < cost
+                elif diagonal:
+                    shorter = any(_octile(start, n) + _octile(n, end) < cost for n in around)
+                else:
+                    shorter = _octile(start, cell) + _octile(cell, end) < cost
+                if shorter:
+                    stale.append(key)
+        for key in stale:
+            del self._entries[key]
+
+    def clear(self):
+        """Remove every entry, keeping the hit and miss counts."""
+        self._entries.clear()
+
+
+def _octile(a, b):
+    # Shortest distance between two cells on an empty 8-connected grid,
+    # a lower bound on the cost between them for every grid move set
+    dx = abs(a[0] - b[0])
+    dy = abs(a[1] - b[1])
+    return max(dx, dy) + (2 ** 0.5 - 1) * min(dx, dy)
+
+
+def _euclidean(a, b):
+    return ((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2) ** 0.5
+
+
+def _blocks_path(cell, path, diagonal):
+    # True if an obstacle in cell breaks the path: the path enters the
+    # cell, or with diagonal steps cuts a corner of it
+    if cell in path:
+        return True
+    if diagonal:
+        for a, b in zip(path, path[1:]):
+            if a[0] != b[0] and a[1] != b[1] and cell in ((a[0], b[1]), (b[0], a[1])):
+                return True
+    return False
+
+
+
+# Built-in engines. Each search function adapts the arguments of plan() to
+# one search.
+
+def _search_a_star(grid, start, end, display_message, diagonal, should_stop, landmarks,
+                   progress, stats, on_expand, time_budget):
+    return a_star_search(
+        grid, start, end, display_message, should_stop, landmarks, progress,
+        stats, on_expand, diagonal,
+    )
+
+
+def _search_jump_points(grid, start, end, display_message, diagonal, should_stop, landmarks,
+                        progress, stats, on_expand, time_budget):
+    return do_jump_point_search(
+        grid, start, end, display_message, diagonal, should_stop, progress,
+        stats, on_expand,
+    )
+
+
+def _search_anytime(grid, start, end, display_message, diagonal, should_stop, landmarks,
+                    progress, stats, on_expand, time_budget):
+    path, _ = do_anytime_search(
+        grid, start, end, display_message, diagonal,
+        ANYTIME_TIME_BUDGET if time_budget is None else time_budget,
+        should_stop=should_stop, progress=progress, stats=stats,
+    )
+    return path
+
+
+def _search_bidirectional(grid, start, end, display_message, diagonal, should_stop, landmarks,
+                          progress, stats, on_expand, time_budget):
+    return do_bidirectional_search(
+        grid, start, end, display_message, diagonal, should_stop, progress, stats
+    )
+
+
+def _search_theta(grid, start, end, display_message, diagonal, should_stop, landmarks,
+                  progress, stats, on_expand, time_budget):
+    return do_theta_star(
+        grid, start, end, display_message, True, should_stop, progress, stats
+    )
+
+
+register_planner("astar", _search_a_star, description="A*")
+register_planner("jps", _search_jump_points, description="Jump Point Search",
+                 uniform_cost=True)
+register_planner("anytime", _search_anytime, description="Anytime A* (ARA*)")
+register_planner("bidir", _search_bidirectional, description="Bidirectional A*")
+register_planner("theta", _search_theta, description="Theta* any-angle paths", any_angle=True,
+                 uniform_cost=True)
+register_planner("dstar", create=IncrementalPlanner, description="D* Lite, repaired after edits",
+                 uniform_cost=True)
+register_planner("hpa", create=HierarchicalPlanner, description="Hierarchical A* over clusters",
+                 uniform_cost=True)
+register_planner("flow", create=FlowFieldPlanner, description="Flow field per goal",
+                 uniform_cost=True)
+
+
 # end of file
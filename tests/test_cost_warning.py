@@ -0,0 +1,32 @@
+"""
+Tests for the warning of engines that ignore cell costs.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import pathPlanner  # noqa: E402
+
+
+def plan_messages(grid, mode):
+    messages = []
+    pathPlanner.plan(grid, (0, 0), (3, 0), lambda message, type="DEBUG": messages.append(type), mode)
+    return messages
+
+
+def test_uniform_cost_engines_warn_on_costs():
+    grid = [[1] * 3 for _ in range(4)]
+    grid[1][0] = 5
+    for mode in ("jps", "theta", "dstar", "hpa", "flow"):
+        assert "WARN" in plan_messages(grid, mode), mode
+    for mode in ("astar", "anytime", "bidir"):
+        assert "WARN" not in plan_messages(grid, mode), mode
+
+
+def test_no_warning_without_costs():
+    grid = [[1] * 3 for _ in range(4)]
+    grid[1][1] = 0
+    for mode in pathPlanner.planner_names():
+        assert "WARN" not in plan_messages(grid, mode), mode
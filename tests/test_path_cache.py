@@ -0,0 +1,59 @@
+"""
+Regression tests for PathCache.invalidate.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import pathPlanner  # noqa: E402
+
+
+def cache_path(grid, start, end, diagonal):
+    cache = pathPlanner.PathCache()
+    path = pathPlanner.plan(grid, start, end, None, "astar", diagonal)
+    cache.put("map", start, end, path, pathPlanner.path_cost(grid, path), diagonal)
+    return cache, path
+
+
+def test_removed_obstacle_unlocks_diagonal_step():
+    # Freeing (2, 2) lets the path step diagonally from (2, 1) to (3, 2)
+    # without passing through the freed cell itself
+    grid = [[1] * 4 for _ in range(6)]
+    grid[2][2] = 0
+    grid[4][1] = 0
+    cache, path = cache_path(grid, (2, 1), (4, 2), True)
+    assert pathPlanner.path_cost(grid, path) == 3
+
+    grid[2][2] = 1
+    cache.invalidate((2, 2), False)
+    assert cache.get("map", (2, 1), (4, 2)) is None
+
+
+def test_added_obstacle_blocks_cut_corner():
+    grid = [[1] * 3 for _ in range(3)]
+    cache, path = cache_path(grid, (0, 0), (2, 2), True)
+    assert path == [(0, 0), (1, 1), (2, 2)]
+
+    grid[1][0] = 0
+    cache.invalidate((1, 0), True)
+    assert cache.get("map", (0, 0), (2, 2)) is None
+
+
+def test_far_edits_keep_entry():
+    grid = [[1] * 8 for _ in range(8)]
+    cache, path = cache_path(grid, (0, 0), (3, 0), False)
+    cache.invalidate((7, 7), True)
+    cache.invalidate((6, 7), False)
+    assert cache.get("map", (0, 0), (3, 0)) == path
+
+
+def test_any_angle_cost_is_length():
+    cache = pathPlanner.PathCache()
+    cache.put("map", (0, 0), (4, 3), [(0, 0), (4, 3)], any_angle=True)
+    # No path through (0, 3) can be shorter than the straight line of length 5
+    cache.invalidate((0, 3), False)
+    assert cache.get("map", (0, 0), (4, 3)) == [(0, 0), (4, 3)]
+    cache.invalidate((2, 1), False)
+    assert cache.get("map", (0, 0), (4, 3)) is None